@@ -0,0 +1,24 @@
+# File Assets.py
+# Locates the files in the assets directory and caches the images loaded from it
+
+import os
+
+from PyQt5.QtGui import QPixmap
+
+ASSETS_DIRECTORY = os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), 'assets')
+
+# file name -> QPixmap, shared by everything drawn in this process
+_pixmaps = {}
+
+
+def asset_path(name):
+    """Returns the path of a file in the assets directory, independent of the working directory"""
+    return os.path.join(ASSETS_DIRECTORY, name)
+
+
+def pixmap(name):
+    """Returns the image with the given file name, it is only read from disk the first time"""
+    if name not in _pixmaps:
+        _pixmaps[name] = QPixmap(asset_path(name))
+    return _pixmaps[name]
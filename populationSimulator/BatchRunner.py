@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+# File BatchRunner.py
+# Runs a grid of simulation settings in parallel without a display
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from populationSimulator.Config import SimulationConfig
+from populationSimulator.Engine import Engine, BACKENDS, PYTHON_BACKEND, prepare_process
+from populationSimulator.Simulation import Simulation
+from populationSimulator.Util import FUNCTION_STRINGS
+
+# plain text spellings of FUNCTION_STRINGS which are easier to type in a shell
+COST_FUNCTION_ALIASES = ['1', 'n', 'n2', 'n3']
+
+SUMMARY_COLUMNS = ('run', 'seed', 'size_mutation', 'sight_mutation', 'speed_mutation',
+                   'speed_cost', 'sight_cost', 'size_cost', 'food', 'population',
+                   'generations', 'final_population', 'extinct', 'seconds')
+
+
+def cost_exponent(text):
+    """Returns the exponent of a cost function given as in FUNCTION_STRINGS or its alias"""
+    if text in FUNCTION_STRINGS:
+        return FUNCTION_STRINGS.index(text)
+    if text in COST_FUNCTION_ALIASES:
+        return COST_FUNCTION_ALIASES.index(text)
+    raise argparse.ArgumentTypeError(
+        "unknown cost function %r, expected one of %s" % (text, ', '.join(COST_FUNCTION_ALIASES)))
+
+
+def toggle(text):
+    if text.lower() in ('on', 'true', 'yes', '1'):
+        return True
+    if text.lower() in ('off', 'false', 'no', '0'):
+        return False
+    raise argparse.ArgumentTypeError("expected on or off, got %r" % text)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run every combination of the given settings in parallel. "
+                    "Each setting accepts several values")
+    parser.add_argument("--config", default=None, metavar="FILE",
+                        help="json file of the settings every run starts from, such as the creature constants")
+    parser.add_argument("--size-mutation", type=toggle, nargs='+', default=None)
+    parser.add_argument("--sight-mutation", type=toggle, nargs='+', default=None)
+    parser.add_argument("--speed-mutation", type=toggle, nargs='+', default=None)
+    parser.add_argument("--speed-cost", type=cost_exponent, nargs='+', default=None,
+                        help="cost function of speed, one of %s" % ', '.join(COST_FUNCTION_ALIASES))
+    parser.add_argument("--sight-cost", type=cost_exponent, nargs='+', default=None,
+                        help="cost function of sight, one of %s" % ', '.join(COST_FUNCTION_ALIASES))
+    parser.add_argument("--size-cost", type=cost_exponent, nargs='+', default=None,
+                        help="cost function of size, one of %s" % ', '.join(COST_FUNCTION_ALIASES))
+    parser.add_argument("--food", type=int, nargs='+', default=None,
+                        help="amount of food spawned each generation")
+    parser.add_argument("--population", type=int, nargs='+', default=None,
+                        help="number of creatures in the first generation")
+    parser.add_argument("--seeds", type=int, nargs='+', default=None,
+                        help="random seeds, every configuration is run once per seed, "
+                             "defaults to the seed of the config or 0")
+    parser.add_argument("--generations", type=int, default=100,
+                        help="maximum number of generations of each run")
+    parser.add_argument("--width", type=int, default=None,
+                        help="width of the world, defaults to the config")
+    parser.add_argument("--height", type=int, default=None,
+                        help="height of the world, defaults to the config")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes, defaults to the number of CPUs")
+    parser.add_argument("--backend", choices=BACKENDS, default=PYTHON_BACKEND,
+                        help="how each run decides where creatures head, the results are the same either way")
+    parser.add_argument("--output", default="batch_results",
+                        help="directory the results are written to")
+    return parser.parse_args(argv)
+
+
+def configurations(arguments):
+    """Expand the arguments into one settings dictionary per run, each holding
+       the settings of the config file along with those being varied"""
+    config = SimulationConfig.load(arguments.config) if arguments.config else SimulationConfig()
+    runs = []
+    # settings which are not varied keep the value in the config
+    for values in product(arguments.size_mutation or [config.enableSizeMutation],
+                          arguments.sight_mutation or [config.enableSightMutation],
+                          arguments.speed_mutation or [config.enableSpeedMutation],
+                          arguments.speed_cost or [config.speedCostExponent],
+                          arguments.sight_cost or [config.sightCostExponent],
+                          arguments.size_cost or [config.sizeCostExponent],
+                          arguments.food or [config.foodAmount],
+                          arguments.population or [config.startingPopulation],
+                          arguments.seeds or [config.seed or 0]):
+        settings = dict(zip(('size_mutation', 'sight_mutation', 'speed_mutation',
+                             'speed_cost', 'sight_cost', 'size_cost',
+                             'food', 'population', 'seed'), values))
+        settings.update(run=len(runs), generations=arguments.generations, backend=arguments.backend,
+                        width=arguments.width or config.width, height=arguments.height or config.height)
+        # checked here so a bad setting stops the batch before any run starts
+        settings['config'] = config.replace(
+            enable_size_mutation=settings['size_mutation'],
+            enable_sight_mutation=settings['sight_mutation'],
+            enable_speed_mutation=settings['speed_mutation'],
+            speed_cost_exponent=settings['speed_cost'],
+            sight_cost_exponent=settings['sight_cost'],
+            size_cost_exponent=settings['size_cost'],
+            food_amount=settings['food'],
+            starting_population=settings['population'],
+            seed=settings['seed'],
+            width=settings['width'],
+            height=settings['height']).to_dict()
+        runs.append(settings)
+    return runs
+
+
+def run_configuration(settings):
+    """Run a single simulation to completion, returns a dictionary of its results.
+       This runs in a worker process so it only takes and returns plain data"""
+    simulation = Simulation(SimulationConfig(**settings['config']))
+    engine = Engine(simulation, settings['width'], settings['height'], backend=settings['backend'])
+
+    start = time.perf_counter()
+    engine.populate()
+    history = []
+    for _ in range(settings['generations']):
+        engine.run_generation()
+        record = {'generation': simulation.generation,
+                  'population': simulation.population_size()}
+        record.update(simulation.creatures.attribute_means())
+        history.append(record)
+        if engine.is_extinct():
+            break
+
+    return {
+        'settings': settings,
+        'generations': simulation.generation,
+        'final_population': simulation.population_size(),
+        'extinct': engine.is_extinct(),
+        'seconds': time.perf_counter() - start,
+        'history': history,
+    }
+
+
+def write_result(output, result):
+    """Write the full result of a run to its own json file"""
+    path = os.path.join(output, "run_%04d.json" % result['settings']['run'])
+    with open(path, 'w') as result_file:
+        json.dump(result, result_file, indent=1)
+
+
+def summary_row(result):
+    settings = result['settings']
+    row = {name: settings.get(name) for name in SUMMARY_COLUMNS}
+    row.update(generations=result['generations'], final_population=result['final_population'],
+               extinct=result['extinct'], seconds=round(result['seconds'], 3))
+    for name in ('speed_cost', 'sight_cost', 'size_cost'):
+        row[name] = FUNCTION_STRINGS[settings[name]]
+    return row
+
+
+def run_batch(runs, output, workers=None, backend=PYTHON_BACKEND):
+    """Run every configuration across a pool of processes, each prepared for the backend
+       first, writing each result as soon as it is done along with a summary of all runs"""
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, "summary.csv"), 'w', newline='', encoding='utf-8') as summary_file:
+        summary = csv.DictWriter(summary_file, SUMMARY_COLUMNS)
+        summary.writeheader()
+        with ProcessPoolExecutor(max_workers=workers, initializer=prepare_process,
+                                 initargs=(backend,)) as executor:
+            futures = [executor.submit(run_configuration, settings)
+                       for settings in runs]
+            for future in as_completed(futures):
+                result = future.result()
+                write_result(output, result)
+                summary.writerow(summary_row(result))
+                summary_file.flush()
+                print("run %d finished after %d generations" %
+                      (result['settings']['run'], result['generations']))
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    # also fills the disk cache of a compiled kernel before the workers need it
+    arguments.backend = prepare_process(arguments.backend)
+    try:
+        runs = configurations(arguments)
+    except ValueError as error:
+        sys.exit("Invalid settings: " + str(error))
+    except OSError as error:
+        sys.exit("Cannot read config: " + str(error))
+    run_batch(runs, arguments.output, arguments.workers, arguments.backend)
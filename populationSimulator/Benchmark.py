@@ -0,0 +1,408 @@
+#!/usr/bin/python3
+# File Benchmark.py
+# Times the hot paths of the simulation at a range of population sizes
+
+from math import sqrt
+from time import perf_counter
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+import numpy as np
+
+from populationSimulator.Checkpoint import capture
+from populationSimulator.Config import DEFAULT_WIDTH, DEFAULT_HEIGHT
+from populationSimulator.Engine import Engine, BACKENDS, PYTHON_BACKEND, load_kernel, prepare_process
+from populationSimulator.Simulation import Simulation
+
+DEFAULT_POPULATIONS = [10, 100, 1000, 10000]
+# the default world is sized for the default starting population,
+# larger populations get a larger world so creatures are as spread out
+BASE_POPULATION = 10
+FOOD_PER_CREATURE = 5
+# steps taken before timing so creatures have left the edges of the world
+WARMUP_TICKS = 20
+# steps taken while measuring memory, which is slowed down by tracemalloc
+MEMORY_TICKS = 10
+# results which are higher is better, everything else is lower is better
+RATES = ('food_searches_per_second', 'hostile_searches_per_second', 'ticks_per_second',
+         'turnovers_per_second', 'generations_per_second', 'frames_per_second',
+         'graph_updates_per_second')
+# modules a run without a display starts from, which must import without the GUI
+HEADLESS_MODULES = ('populationSimulator.Headless', 'populationSimulator.BatchRunner')
+GUI_PACKAGES = ('PyQt5', 'matplotlib')
+IMPORT_BUDGET = 0.5  # seconds
+IMPORT_REPEATS = 5
+# runs compared between every backend by --check-backends
+CHECK_SEEDS = (1, 2, 3, 4, 5)
+CHECK_POPULATION = 200
+CHECK_GENERATIONS = 20
+# numbers of worker processes compared with a single process by --check-backends, for fewer
+# seeds as each step then waits on the other processes
+CHECK_WORKERS = (3,)
+CHECK_SHARDED_SEEDS = (1, 2)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time the hot paths of the simulation at several population sizes")
+    parser.add_argument("--populations", type=int, nargs='+', default=DEFAULT_POPULATIONS,
+                        help="starting populations to benchmark, food is scaled along with them")
+    parser.add_argument("--food-per-creature", type=int, default=FOOD_PER_CREATURE)
+    parser.add_argument("--ticks", type=int, default=100,
+                        help="number of time steps timed at each population")
+    parser.add_argument("--generations", type=int, default=3,
+                        help="number of whole generations timed at each population")
+    parser.add_argument("--generation-ticks", type=int, default=1000,
+                        help="generations are cut short after this many time steps")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=BACKENDS, default=PYTHON_BACKEND,
+                        help="how creatures decide where to head in the time steps and generations, "
+                             "the searches are always timed in python")
+    parser.add_argument("--gui", action='store_true',
+                        help="also time rendering and the graph, offscreen unless QT_QPA_PLATFORM is set")
+    parser.add_argument("--check-backends", action='store_true',
+                        help="instead of timing anything, check every backend and number of workers "
+                             "gives the same runs as python in a single process")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET, metavar="SECONDS",
+                        help="fail if importing the headless modules in a new process takes longer")
+    parser.add_argument("--output", default=None, metavar="FILE",
+                        help="write the results to this file as json")
+    parser.add_argument("--baseline", default=None, metavar="FILE",
+                        help="compare against results written earlier with --output")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="fraction a result may be worse than the baseline before it is a regression")
+    return parser.parse_args(argv)
+
+
+def world_size(population):
+    scale = max(1.0, sqrt(population / BASE_POPULATION))
+    return int(DEFAULT_WIDTH * scale), int(DEFAULT_HEIGHT * scale)
+
+
+def create_engine(population, food_per_creature, seed, backend=PYTHON_BACKEND, workers=1):
+    width, height = world_size(population)
+    simulation = Simulation(food_amount=population * food_per_creature,
+                            starting_population=population, seed=seed, width=width, height=height)
+    if workers > 1:
+        from populationSimulator.Sharding import ShardedEngine
+        engine = ShardedEngine(simulation, width, height, workers=workers, backend=backend)
+    else:
+        engine = Engine(simulation, width, height, backend=backend)
+    engine.populate()
+    return engine
+
+
+def search_arguments(engine):
+    """Build the per step arguments of the searches the same way Engine.step does"""
+    population = engine.simulation.creatures
+    n = population.count
+    living_sizes = population.size[:n][population.alive[:n]]
+    return (population.slotOf, population.x[:n].tolist(), population.y[:n].tolist(),
+            population.size[:n].tolist(), engine.simulation.food, living_sizes.min())
+
+
+def time_searches(engine):
+    """Run the food and hostile search once for every living creature"""
+    population = engine.simulation.creatures
+    slots, xs, ys, sizes, food_by_id, smallest_size = search_arguments(engine)
+    living = list(slots.values())
+    seeing_distance = population.sightRadius
+    prey_sizes = population.preySize
+    predator_sizes = population.predatorSize
+    flee_radius = population.fleeRadius
+
+    start = perf_counter()
+    for slot in living:
+        engine.find_closest_food(slot, seeing_distance[slot], prey_sizes[slot], slots, xs, ys, sizes,
+                                 food_by_id, smallest_size)
+    food_seconds = perf_counter() - start
+
+    start = perf_counter()
+    for slot in living:
+        engine.find_hostile(slot, flee_radius[slot], predator_sizes[slot],
+                            slots, xs, ys, sizes)
+    hostile_seconds = perf_counter() - start
+
+    return {
+        'food_searches_per_second': len(living) / food_seconds if food_seconds else None,
+        'hostile_searches_per_second': len(living) / hostile_seconds if hostile_seconds else None,
+    }
+
+
+def time_steps(engine, ticks):
+    """Time steps until either enough were taken or the generation ended"""
+    taken = 0
+    start = perf_counter()
+    while taken < ticks:
+        taken += 1
+        if not engine.step():
+            break
+    return taken / (perf_counter() - start)
+
+
+def time_generations(engine, generations, generation_ticks):
+    """Time the generation turnover on its own, then whole generations"""
+    start = perf_counter()
+    engine.next_generation()
+    turnover_seconds = perf_counter() - start
+
+    finished = 0
+    start = perf_counter()
+    while finished < generations and not engine.is_extinct():
+        engine.run_generation(generation_ticks)
+        finished += 1
+    seconds = perf_counter() - start
+    return 1 / turnover_seconds, finished / seconds if finished else None
+
+
+def peak_memory(population, food_per_creature, seed, backend=PYTHON_BACKEND):
+    """Peak memory in megabytes allocated while setting up, stepping and turning over a world"""
+    tracemalloc.start()
+    engine = create_engine(population, food_per_creature, seed, backend)
+    for _ in range(MEMORY_TICKS):
+        engine.step()
+    engine.next_generation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+class GuiBenchmark:
+    """
+    Times drawing snapshots with the real SimulationView and adding
+    generations to the graph. Qt is only imported when this is used
+    """
+
+    def __init__(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtWidgets import QApplication
+        from populationSimulator.MainWindow import MainWindow
+        from populationSimulator.SimulationView import SimulationView
+
+        self.application = QApplication.instance() or QApplication(sys.argv)
+        self.mainWindow = MainWindow()
+        self.view = SimulationView(self.mainWindow)
+
+    def time_rendering(self, engine, ticks):
+        view = self.view
+        view.create_graphics_scene(engine.width, engine.height)
+        view.render(engine.snapshot())
+
+        frames = 0
+        seconds = 0
+        while frames < ticks and engine.step():
+            snapshot = engine.snapshot()
+            start = perf_counter()
+            view.render(snapshot)
+            self.application.processEvents()
+            seconds += perf_counter() - start
+            frames += 1
+        view.delete_assets()
+        return frames / seconds if seconds else None
+
+    def time_graph(self, engine, updates):
+        graph = self.view.graphView
+        graph.reset_graph()
+        graph.set_simulation(engine.simulation)
+        graph.create_axis()
+        averages = engine.simulation.creatures.attribute_means()
+
+        start = perf_counter()
+        for _ in range(updates):
+            graph.update_graph(averages)
+        return updates / (perf_counter() - start)
+
+
+def time_imports(modules=HEADLESS_MODULES, repeats=IMPORT_REPEATS):
+    """
+    Import modules in fresh interpreters, as every batch worker does when
+    it starts. Returns the quickest time taken and any GUI packages the
+    modules pulled in
+    """
+    code = ("import sys, time\n"
+            "start = time.perf_counter()\n"
+            + "".join("import %s\n" % module for module in modules) +
+            "print(time.perf_counter() - start)\n"
+            "print(' '.join(sorted({name.split('.')[0] for name in sys.modules} & set(%r))))\n"
+            % (GUI_PACKAGES,))
+    environment = dict(os.environ)
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment['PYTHONPATH'] = os.pathsep.join(
+        path for path in (package_root, environment.get('PYTHONPATH')) if path)
+
+    fastest = None
+    gui_packages = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', code], env=environment, check=True,
+                                capture_output=True, text=True).stdout.split('\n')
+        seconds = float(output[0])
+        fastest = seconds if fastest is None else min(fastest, seconds)
+        gui_packages = output[1].split()
+    return fastest, gui_packages
+
+
+def import_problems(seconds, gui_packages, budget):
+    """Returns a description of everything wrong with how the headless modules import"""
+    found = ["importing %s took %.3f s, over the budget of %.3f s" %
+             (', '.join(HEADLESS_MODULES), seconds, budget)] if seconds > budget else []
+    found += ["importing %s also imported %s" % (', '.join(HEADLESS_MODULES), package)
+              for package in gui_packages]
+    return found
+
+
+def compare_runs(description, engine, expected, generations):
+    """
+    Run two engines side by side and compare everything a checkpoint would
+    save after each generation. Returns a description of the first
+    difference, if there is one
+    """
+    found = []
+    for _ in range(generations):
+        expected.run_generation()
+        engine.run_generation()
+        (header, arrays), (expected_header, expected_arrays) = capture(engine), capture(expected)
+        different = [name for name in expected_arrays
+                     if not np.array_equal(arrays[name], expected_arrays[name])]
+        if header != expected_header:
+            different.insert(0, 'header')
+        if different:
+            found.append("%s, generation %d: %s differ" %
+                         (description, expected.simulation.generation, ', '.join(different)))
+            break
+        if expected.is_extinct():
+            break
+    print("%s: %s after %d generations" %
+          (description, "different" if found else "same", expected.simulation.generation))
+    return found
+
+
+def check_backends(seeds=CHECK_SEEDS, population=CHECK_POPULATION, generations=CHECK_GENERATIONS,
+                   workers=CHECK_WORKERS, sharded_seeds=CHECK_SHARDED_SEEDS):
+    """
+    Run the same seeds with every backend against the python backend, and
+    sharded between each number of workers against a single process with
+    the same backend. Every step is sharded, however few creatures it has.
+    Returns a description of every difference, and of every backend which
+    could not be used
+    """
+    found = []
+    backends = [PYTHON_BACKEND]
+    for backend in BACKENDS:
+        if backend == PYTHON_BACKEND:
+            continue
+        if load_kernel(backend) is None:
+            found.append("the %s backend cannot be used here" % backend)
+            continue
+        backends.append(backend)
+        for seed in seeds:
+            found += compare_runs("%s backend seed %d" % (backend, seed),
+                                  create_engine(population, FOOD_PER_CREATURE, seed, backend),
+                                  create_engine(population, FOOD_PER_CREATURE, seed), generations)
+
+    for backend in backends:
+        for count in workers:
+            for seed in sharded_seeds:
+                engine = create_engine(population, FOOD_PER_CREATURE, seed, backend, count)
+                engine.MIN_SHARDED_VISITS = 1
+                engine.MIN_SHARD_SIZE = 1
+                try:
+                    found += compare_runs("%s backend with %d workers seed %d" % (backend, count, seed),
+                                          engine, create_engine(population, FOOD_PER_CREATURE, seed, backend),
+                                          generations)
+                finally:
+                    engine.close()
+    return found
+
+
+def benchmark(population, arguments, gui=None):
+    """Run every benchmark at one population size, returns a dictionary of results"""
+    engine = create_engine(population, arguments.food_per_creature, arguments.seed, arguments.backend)
+    # the warm up also compiles a kernel, if the backend has one
+    for _ in range(WARMUP_TICKS):
+        engine.step()
+
+    result = {'population': population, 'food': engine.simulation.foodAmount,
+              'world': '%dx%d' % (engine.width, engine.height)}
+    result.update(time_searches(engine))
+    result['ticks_per_second'] = time_steps(engine, arguments.ticks)
+    result['turnovers_per_second'], result['generations_per_second'] = time_generations(
+        engine, arguments.generations, arguments.generation_ticks)
+    result['peak_memory_mb'] = peak_memory(
+        population, arguments.food_per_creature, arguments.seed, arguments.backend)
+
+    if gui:
+        rendered = create_engine(population, arguments.food_per_creature, arguments.seed)
+        result['frames_per_second'] = gui.time_rendering(rendered, arguments.ticks)
+        result['graph_updates_per_second'] = gui.time_graph(rendered, arguments.ticks)
+    return result
+
+
+def print_result(result):
+    print("population %d, food %d, world %s" %
+          (result['population'], result['food'], result['world']))
+    for name, value in result.items():
+        if name in ('population', 'food', 'world'):
+            continue
+        print("  %-28s %s" % (name, "-" if value is None else "%.2f" % value))
+
+
+def regressions(results, baseline, tolerance):
+    """Returns a description of every result noticeably worse than the same result in the baseline"""
+    found = []
+    previous = {result['population']: result for result in baseline}
+    for result in results:
+        before = previous.get(result['population'])
+        if not before:
+            continue
+        for name, value in result.items():
+            old = before.get(name)
+            if not isinstance(value, float) or not isinstance(old, float) or not old:
+                continue
+            if name in RATES:
+                worse = value < old * (1 - tolerance)
+            else:
+                worse = value > old * (1 + tolerance)
+            if worse:
+                found.append("population %d %s: %.2f, was %.2f" %
+                             (result['population'], name, value, old))
+    return found
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    if arguments.check_backends:
+        differences = check_backends()
+        for difference in differences:
+            print("problem " + difference)
+        sys.exit(1 if differences else 0)
+
+    arguments.backend = prepare_process(arguments.backend)
+    import_seconds, gui_packages = time_imports()
+    print("import %-28s %.3f s" % ("headless modules", import_seconds))
+    problems = import_problems(import_seconds, gui_packages, arguments.import_budget)
+    for problem in problems:
+        print("problem " + problem)
+    gui = GuiBenchmark() if arguments.gui else None
+
+    results = []
+    for population in arguments.populations:
+        result = benchmark(population, arguments, gui)
+        print_result(result)
+        results.append(result)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=1)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            found = regressions(results, json.load(baseline_file), arguments.tolerance)
+        for regression in found:
+            print("regression " + regression)
+        problems += found
+
+    if problems:
+        sys.exit(1)
@@ -0,0 +1,159 @@
+# File Checkpoint.py
+# Saves the complete state of a running simulation and restores it later
+
+from queue import SimpleQueue
+from threading import Thread
+from zipfile import BadZipFile
+import json
+import logging
+import os
+import numpy as np
+
+from populationSimulator.Engine import Engine, PYTHON_BACKEND
+from populationSimulator.Food import Food
+from populationSimulator.Population import Population
+from populationSimulator.Simulation import Simulation
+
+FORMAT_VERSION = 1
+
+
+def capture(engine):
+    """
+    Copy everything needed to carry on a simulation exactly where it left
+    off into a header and a dictionary of arrays. This is quick, the slow
+    part of saving is left to whoever writes the copy out
+    """
+    simulation = engine.simulation
+    population = simulation.creatures
+    random_version, random_state, gauss_next = simulation.random.getstate()
+    header = {
+        'version': FORMAT_VERSION,
+        'width': engine.width,
+        'height': engine.height,
+        'ticks': engine.ticks,
+        'foodSpawned': engine.foodSpawned,
+        'generation': simulation.generation,
+        'nextEntityId': simulation.nextEntityId,
+        # the food amount is the only setting which can change during a run
+        'settings': simulation.config.replace(food_amount=simulation.foodAmount, width=engine.width,
+                                              height=engine.height).to_dict(),
+        'randomVersion': random_version,
+        'gaussNext': gauss_next,
+        'creatureCount': population.count,
+    }
+    if engine.statistics:
+        header['statistics'] = {name: moments.state()
+                                for name, moments in engine.statistics.moments.items()}
+
+    arrays = {'creature_' + name: getattr(population, name)[:population.count].copy()
+              for name, _ in Population.COLUMNS}
+    food = list(simulation.food.values())
+    arrays['food_id'] = np.array([piece.id for piece in food], dtype=np.int64)
+    arrays['food_x'] = np.array([piece.x for piece in food])
+    arrays['food_y'] = np.array([piece.y for piece in food])
+    arrays['random_state'] = np.array(random_state, dtype=np.uint32)
+    return header, arrays
+
+
+def write(path, header, arrays):
+    """Write a captured checkpoint. It is written beside the path first and then
+       moved over it, so a crash part way through never leaves a broken checkpoint"""
+    temporary = path + '.partial'
+    with open(temporary, 'wb') as checkpoint_file:
+        np.savez_compressed(checkpoint_file, header=np.array(json.dumps(header)), **arrays)
+    os.replace(temporary, path)
+
+
+def restore(path, recorder=None, events=None, profiler=None, statistics=None, workers=1,
+            backend=PYTHON_BACKEND):
+    """Returns an engine carrying on from a checkpoint, sharded between processes if
+       given several workers. A statistics writer given here carries on with the
+       running moments saved in the checkpoint"""
+    header, arrays = load(path)
+    try:
+        simulation = Simulation(**header['settings'])
+        simulation.random.setstate((header['randomVersion'],
+                                    tuple(arrays['random_state'].tolist()), header['gaussNext']))
+        simulation.generation = header['generation']
+        simulation.nextEntityId = header['nextEntityId']
+        simulation.restore_creatures(
+            {name: arrays['creature_' + name] for name, _ in Population.COLUMNS},
+            header['creatureCount'])
+        for food_id, x, y in zip(arrays['food_id'].tolist(), arrays['food_x'].tolist(),
+                                 arrays['food_y'].tolist()):
+            food = Food(x, y)
+            food.id = food_id
+            simulation.insert_food(food)
+        width, height, ticks = header['width'], header['height'], header['ticks']
+        food_spawned = header['foodSpawned']
+    except KeyError as error:
+        raise ValueError("%s is missing %s" % (path, error)) from error
+
+    if workers > 1:
+        from populationSimulator.Sharding import ShardedEngine
+        engine = ShardedEngine(simulation, width, height,
+                               recorder, events, profiler, statistics, workers, backend)
+    else:
+        engine = Engine(simulation, width, height,
+                        recorder, events, profiler, statistics, backend)
+    engine.ticks = ticks
+    engine.foodSpawned = food_spawned
+    if statistics and 'statistics' in header:
+        for name, state in header['statistics'].items():
+            statistics.moments[name].restore(state)
+    return engine
+
+
+def load(path, header_only=False):
+    """Returns the header and, unless only the header is wanted, the arrays of a checkpoint.
+       Raises OSError if the file cannot be read and ValueError if it is not a checkpoint
+       which can be restored"""
+    try:
+        with np.load(path) as checkpoint:
+            header = json.loads(str(checkpoint['header']))
+            arrays = {} if header_only else {name: checkpoint[name] for name in checkpoint.files
+                                             if name != 'header'}
+    except (ValueError, KeyError, BadZipFile) as error:
+        raise ValueError(path + " is not a checkpoint") from error
+    if header.get('version') != FORMAT_VERSION:
+        raise ValueError("Unsupported checkpoint version " + str(header.get('version')))
+    return header, arrays
+
+
+def checkpoint_generation(path):
+    """Returns the generation a checkpoint was taken at without restoring it"""
+    return load(path, header_only=True)[0]['generation']
+
+
+class CheckpointWriter:
+    """
+    Saves checkpoints of an engine on a background thread. Only copying
+    the state happens on the caller's thread, so the simulation does not
+    wait for compression or the disk
+    """
+
+    def __init__(self):
+        self.queue = SimpleQueue()
+        self.thread = Thread(target=self.write_checkpoints, daemon=True)
+        self.thread.start()
+
+    def save(self, engine, path):
+        header, arrays = capture(engine)
+        self.queue.put((path, header, arrays))
+
+    def write_checkpoints(self):
+        """Runs on the background thread until close() is called"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            path, header, arrays = item
+            try:
+                write(path, header, arrays)
+            except OSError:
+                logging.exception("Could not write checkpoint " + path)
+
+    def close(self):
+        """Wait for every checkpoint saved so far to be written"""
+        self.queue.put(None)
+        self.thread.join()
@@ -0,0 +1,116 @@
+# File Config.py
+# Describes everything needed to set up a run, without any dependency on Qt
+
+import json
+
+from populationSimulator.Util import FUNCTION_STRINGS
+
+# the size of the simulation window in the GUI
+DEFAULT_WIDTH = 1271
+DEFAULT_HEIGHT = 1001
+# smaller worlds leave no room inside the border kept clear of food and creatures
+MIN_WORLD_SIZE = 100
+
+# key, type, default, smallest and largest allowed value of every setting
+FIELDS = (
+    # the world
+    ('width', int, DEFAULT_WIDTH, MIN_WORLD_SIZE, None),
+    ('height', int, DEFAULT_HEIGHT, MIN_WORLD_SIZE, None),
+    ('seed', int, None, 0, None),  # chosen at random when the simulation is created if None
+    ('food_amount', int, 50, 0, None),  # spawned each generation
+    ('starting_population', int, 10, 0, None),
+    # evolution, cost exponents index FUNCTION_STRINGS
+    ('enable_size_mutation', bool, True, None, None),
+    ('enable_sight_mutation', bool, True, None, None),
+    ('enable_speed_mutation', bool, True, None, None),
+    ('speed_cost_exponent', int, 2, 0, len(FUNCTION_STRINGS) - 1),
+    ('sight_cost_exponent', int, 1, 0, len(FUNCTION_STRINGS) - 1),
+    ('size_cost_exponent', int, 3, 0, len(FUNCTION_STRINGS) - 1),
+    # each attribute of a child can be up to this much above or below its parent's
+    ('mutation_range', float, 0.5, 0, None),
+    # creatures
+    ('starting_energy', float, 1500, 0, None),  # how far a creature can move before it needs to stop
+    ('danger_zone', float, 150, 0, None),  # only run away if a creature is this close
+    ('food_to_reproduce', int, 2, 1, None),
+    ('min_speed', float, 0.5, 0, None),
+    ('speed_modifier', float, 2, 0, None),
+    ('min_sight', float, 0.5, 0, None),
+    ('sight_modifier', float, 200, 0, None),
+    ('min_size', float, 0.5, 0, None),  # above 0
+    ('eat_size', float, 1.2, 1, None),  # creature must be 20% larger than another creature to eat it, above 1
+)
+KEYS = tuple(field[0] for field in FIELDS)
+# settings which have to be above their smallest value rather than at least it,
+# creatures of size 0 or which can eat their own size would eat themselves
+ABOVE_MINIMUM = ('min_size', 'eat_size')
+
+
+def attribute_name(key):
+    """The attribute a setting is stored under, food_amount is stored as foodAmount"""
+    first, *rest = key.split('_')
+    return first + ''.join(part.title() for part in rest)
+
+
+class SimulationConfig:
+    """
+    Every setting of a run, checked when it is created. A config is only
+    plain values, so it can be written to and loaded from a json file or
+    sent to another process, and it never changes once created: replace()
+    returns a changed copy. Settings are passed with the keys of FIELDS
+    and read back as attributes, food_amount as foodAmount
+    """
+
+    def __init__(self, **settings):
+        unknown = set(settings) - set(KEYS)
+        if unknown:
+            raise ValueError("Unknown settings " + ', '.join(sorted(unknown)))
+        for key, kind, default, minimum, maximum in FIELDS:
+            value = settings.get(key, default)
+            if value is not None or default is not None:
+                value = self.check(key, kind, value, minimum, maximum)
+            setattr(self, attribute_name(key), value)
+
+    @staticmethod
+    def check(key, kind, value, minimum, maximum):
+        """Returns a setting as its type, raising ValueError if it is not allowed"""
+        if kind is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        # bool is a subclass of int but never a sensible number
+        if not isinstance(value, kind) or (kind is not bool and isinstance(value, bool)):
+            raise ValueError("%s must be a %s, got %r" % (key, kind.__name__, value))
+        if minimum is not None and key in ABOVE_MINIMUM and value <= minimum:
+            raise ValueError("%s must be above %s, got %r" % (key, minimum, value))
+        if minimum is not None and value < minimum:
+            raise ValueError("%s must be at least %s, got %r" % (key, minimum, value))
+        if maximum is not None and value > maximum:
+            raise ValueError("%s must be at most %s, got %r" % (key, maximum, value))
+        return value
+
+    def __repr__(self):
+        return "SimulationConfig(%s)" % ', '.join(
+            "%s=%r" % (key, value) for key, value in self.to_dict().items())
+
+    def __eq__(self, other):
+        return isinstance(other, SimulationConfig) and self.to_dict() == other.to_dict()
+
+    def to_dict(self):
+        return {key: getattr(self, attribute_name(key)) for key in KEYS}
+
+    def replace(self, **changes):
+        """Returns a copy of the config with some settings changed"""
+        settings = self.to_dict()
+        settings.update(changes)
+        return SimulationConfig(**settings)
+
+    def save(self, path):
+        with open(path, 'w') as config_file:
+            json.dump(self.to_dict(), config_file, indent=1)
+
+    @staticmethod
+    def load(path):
+        """Read a config written by save(), settings missing from the file keep their defaults"""
+        with open(path) as config_file:
+            settings = json.load(config_file)
+        if not isinstance(settings, dict):
+            raise ValueError(path + " does not hold a json object of settings")
+        return SimulationConfig(**settings)
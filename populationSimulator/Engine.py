@@ -0,0 +1,586 @@
+# File Engine.py
+# Steps a simulation forward without any dependency on Qt
+
+from sys import maxsize
+from time import perf_counter
+import gc
+import logging
+import numpy as np
+
+from populationSimulator.EventLog import EventLog, BORN, PERISHED, ATE, FLED, GENERATION
+from populationSimulator.Population import NO_TARGET, FOOD_TARGET, CREATURE_TARGET
+from populationSimulator.Simulation import Simulation
+from populationSimulator.Profiler import THREAT_SCAN, FOOD_SEARCH, MOVEMENT, EATING, \
+    GENERATION_RESET, FOOD_RESPAWN
+from populationSimulator.Util import Point, distance_squared
+
+# ways of deciding where creatures head, which all give the same decisions
+PYTHON_BACKEND = 'python'
+NUMBA_BACKEND = 'numba'  # compiled, needs numba
+BACKENDS = (PYTHON_BACKEND, NUMBA_BACKEND)
+
+
+def load_kernel(backend):
+    """Returns the compiled kernel of a backend, or None to decide in Python.
+       Falls back to Python if the kernel cannot be compiled here"""
+    if backend == PYTHON_BACKEND:
+        return None
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend " + str(backend))
+    try:
+        # numba is slow to import and optional, so it is only imported when asked for
+        from populationSimulator.Kernel import CompiledKernel
+    except ImportError as error:
+        logging.warning("Cannot use the %s backend, deciding in Python instead: %s", backend, error)
+        return None
+    return CompiledKernel()
+
+
+def prepare_process(backend):
+    """
+    Get a process ready to run simulations with a backend, returning the
+    backend it can actually use. A compiled kernel is compiled, or loaded
+    from the disk cache, by running a small world with it for long enough
+    to scan for threats. Compiling leaves behind a great many objects which
+    every full garbage collection would go through, so once the garbage is
+    collected everything left is frozen out of its way. That affects the
+    whole process, so this is only for entry points, once per process
+    """
+    engine = Engine(Simulation(seed=0), 1000, 1000, backend=backend)
+    if not engine.kernel:
+        return PYTHON_BACKEND
+    engine.populate()
+    for _ in range(Engine.THREAT_SCAN_INTERVAL):
+        if not engine.step():
+            break
+    gc.collect()
+    gc.freeze()
+    return backend
+
+
+class Snapshot:
+    """
+    A copy of the world at a single point in time. Renderers only ever
+    read snapshots so they never have to reach into the engine state
+    """
+
+    def __init__(self, generation, tick, creatures, food, population=None):
+        self.generation = generation
+        self.tick = tick
+        self.creatures = creatures  # list of (id, x, y)
+        self.food = food  # list of (id, x, y)
+        # number of living creatures, which a cropped snapshot holds fewer of
+        self.population = len(creatures) if population is None else population
+
+    def cropped(self, bounds):
+        """Returns a copy of the snapshot holding only what is inside the
+           (left, top, right, bottom) bounds"""
+        left, top, right, bottom = bounds
+        return Snapshot(
+            self.generation, self.tick,
+            [entity for entity in self.creatures
+             if left <= entity[1] <= right and top <= entity[2] <= bottom],
+            [entity for entity in self.food
+             if left <= entity[1] <= right and top <= entity[2] <= bottom],
+            self.population)
+
+
+class Engine:
+    """
+    Owns the world state of a simulation and advances it one time step
+    at a time. Nothing here needs a display, so a simulation can be run
+    as fast as the CPU allows
+    """
+
+    # how many time steps pass between each creature looking for threats
+    THREAT_SCAN_INTERVAL = 30
+    LIST_VISITS_RATIO = 8  # decide() copies positions to lists once one in this many creatures is visited
+    BUFFER = 20  # ensure we don't drop items too close to the extremes of the world
+    FOOD_BUFFER = 25  # don't let food spawn too close to the edges
+
+    def __init__(self, simulation, width, height, recorder=None, events=None, profiler=None,
+                 statistics=None, backend=PYTHON_BACKEND):
+        self.simulation = simulation
+        # optional TrajectoryRecorder which is handed every time step
+        self.recorder = recorder
+        # an event log without sinks skips all event work
+        self.events = events or EventLog()
+        # optional Profiler which is handed the time taken by each phase
+        self.profiler = profiler
+        # optional StatisticsWriter which is handed the end of every generation
+        self.statistics = statistics
+        # the decisions of each step are made by a compiled kernel if the backend has one
+        self.backend = backend
+        self.kernel = load_kernel(backend)
+        self.width = width
+        self.height = height
+        # food and creatures are spawned inside a slightly smaller area
+        self.spawnWidth = int(width) - self.BUFFER
+        self.spawnHeight = int(height) - self.BUFFER
+        self.center = Point(width / 2, height / 2)
+        self.ticks = 0
+        # amount of food spawned at the start of the current generation
+        self.foodSpawned = 0
+
+    def populate(self):
+        """Create the food and creatures for the first generation"""
+        self.create_food(self.simulation.foodAmount)
+        self.create_creatures(self.simulation.startingPopulation)
+        self.record_generation()
+
+    def create_food(self, food_amount):
+        """Scatter new food across the world, drawing every position at once"""
+        random = self.simulation.batch_random()
+        self.foodSpawned = food_amount
+        food_x = random.integers(self.FOOD_BUFFER, self.spawnWidth - self.FOOD_BUFFER,
+                                 food_amount, endpoint=True)
+        food_y = random.integers(self.FOOD_BUFFER, self.spawnHeight - self.FOOD_BUFFER,
+                                 food_amount, endpoint=True)
+        self.simulation.add_foods(food_x.tolist(), food_y.tolist())
+
+    def random_perimeter_positions(self, random, count):
+        """Return arrays of x and y positions along the perimeter of the world,
+           each on a random side. Helpful when placing creatures"""
+        side = random.integers(1, 4, count, endpoint=True)
+        along_x = random.integers(self.BUFFER, self.spawnWidth - self.BUFFER, count, endpoint=True) - self.BUFFER
+        along_y = random.integers(self.BUFFER, self.spawnHeight - self.BUFFER, count, endpoint=True) - self.BUFFER
+        north = side == 1
+        east = side == 2
+        south = side == 3
+        x = np.where(north | south, along_x, np.where(east, self.spawnWidth - self.BUFFER, 0))
+        y = np.where(east | ~(north | south), along_y, np.where(north, self.spawnHeight - self.BUFFER, 0))
+        return x.astype(np.float64), y.astype(np.float64)
+
+    def place_creatures(self, random, size, sight, speed):
+        """Add a creature for every entry of the given attribute arrays somewhere
+           along the perimeter, returns their slots"""
+        x, y = self.random_perimeter_positions(random, len(size))
+        return self.simulation.add_creatures(x, y, size, sight, speed)
+
+    def create_creatures(self, creature_amount):
+        attributes = np.ones(creature_amount)
+        self.place_creatures(self.simulation.batch_random(), attributes, attributes, attributes)
+
+    def find_hostile(self, slot, danger_distance, predator_size, slots, xs, ys, sizes):
+        """Returns the id of a creature of at least predator_size, large enough
+           to eat the given creature, which is too close for comfort, or -1 if
+           there is none. Of several such creatures the oldest one is returned"""
+        x = xs[slot]
+        y = ys[slot]
+        danger_squared = danger_distance * danger_distance
+
+        hostile_id = -1
+        for other_id in self.simulation.creatureGrid.query(x, y, danger_distance):
+            if hostile_id != -1 and other_id > hostile_id:
+                continue
+            other = slots[other_id]
+            if other != slot and sizes[other] >= predator_size:
+                # distances are written out rather than calling Util, this runs for every pair
+                delta_x = xs[other] - x
+                delta_y = ys[other] - y
+                if delta_x * delta_x + delta_y * delta_y <= danger_squared:
+                    hostile_id = other_id
+        return hostile_id
+
+    def find_closest_food(self, slot, seeing_distance, prey_size, slots, xs, ys, sizes, food_by_id, smallest_size):
+        """Finds the closest food or creature of at most prey_size within sight of
+           the given creature, returns its kind of target, its id and its squared
+           distance. Ties go to food over creatures, then to the oldest"""
+        x = xs[slot]
+        y = ys[slot]
+
+        # the grid returns whole cells, so anything out of sight still has to be skipped
+        closest = (NO_TARGET, -1, seeing_distance * seeing_distance)
+        for food_id in self.simulation.foodGrid.query(x, y, seeing_distance):
+            food = food_by_id[food_id]
+            delta_x = food.x - x
+            delta_y = food.y - y
+            distance = delta_x * delta_x + delta_y * delta_y
+            if distance < closest[2] or (distance == closest[2] and closest[0] == FOOD_TARGET
+                                         and food_id < closest[1]):
+                closest = (FOOD_TARGET, food_id, distance)
+
+        # no creature is small enough to be eaten by this one
+        if smallest_size > prey_size:
+            return closest
+
+        for other_id in self.simulation.creatureGrid.query(x, y, seeing_distance):
+            other = slots[other_id]
+            if other != slot and sizes[other] <= prey_size:
+                delta_x = xs[other] - x
+                delta_y = ys[other] - y
+                distance = delta_x * delta_x + delta_y * delta_y
+                if distance < closest[2] or (distance == closest[2] and closest[0] == CREATURE_TARGET
+                                             and other_id < closest[1]):
+                    closest = (CREATURE_TARGET, other_id, distance)
+
+        return closest
+
+    def step(self):
+        """
+        Advance the simulation by one time step.
+        Every creature decides where to go based on the positions at the
+        start of the step, then all creatures move at once.
+        Only creatures which can still act are visited, except when scanning
+        for threats, which may wake up creatures that are full.
+        Returns False once no creature could move, which ends the generation
+        """
+        self.ticks += 1
+        population = self.simulation.creatures
+        n = population.count
+        scan_for_threats = self.ticks % self.THREAT_SCAN_INTERVAL == 0
+        if scan_for_threats:
+            visiting = np.flatnonzero(~population.out_of_energy())
+        else:
+            visiting = np.flatnonzero(population.acting[:n])
+        # nobody is left who can act, so nothing will ever move again
+        if len(visiting) == 0:
+            return False
+
+        target_x = np.zeros(n)
+        target_y = np.zeros(n)
+        direction = np.zeros(n)
+        chasing = np.zeros(n, dtype=bool)
+        profiler = self.profiler
+        creature_moved, threat_seconds, food_seconds = self.decide(
+            visiting, scan_for_threats, target_x, target_y, direction, chasing)
+
+        # creatures running away are the ones moving backwards
+        if self.events.wants(FLED):
+            for slot in np.flatnonzero(direction < 0).tolist():
+                self.events.record(FLED, self.simulation.generation, self.ticks,
+                                   creature=int(population.ids[slot]),
+                                   hostile=int(population.hostileId[slot]))
+
+        if profiler:
+            if scan_for_threats:
+                profiler.add(THREAT_SCAN, threat_seconds)
+            profiler.add(FOOD_SEARCH, food_seconds)
+            started = perf_counter()
+        self.move(target_x, target_y, direction)
+        if profiler:
+            profiler.add(MOVEMENT, perf_counter() - started)
+            started = perf_counter()
+        self.eat(self.reaching(chasing, self.reach()), population.slotOf, self.simulation.food)
+        population.update_acting(visiting)
+        if profiler:
+            profiler.add(EATING, perf_counter() - started)
+            profiler.ticks += 1
+
+        if self.recorder:
+            self.recorder.record_frame(self)
+
+        return creature_moved
+
+    def decide(self, visiting, scan_for_threats, target_x, target_y, direction, chasing):
+        """
+        Work out where each of the visited creatures heads this time step,
+        writing it into the given arrays along with the target and hostile
+        of each creature. Only positions from the start of the step are
+        read, so creatures can be decided on in any order and in parallel.
+        Returns whether any creature is moving towards something, and the
+        seconds spent scanning for threats and searching for food
+        """
+        if self.kernel:
+            return self.kernel.decide(self, visiting, scan_for_threats, target_x, target_y,
+                                      direction, chasing)
+        population = self.simulation.creatures
+        n = population.count
+        x = population.x[:n]
+        y = population.y[:n]
+        # plain lists are much quicker than arrays to index one element at a time,
+        # but converting every creature only pays off once enough of them are visited
+        if len(visiting) * self.LIST_VISITS_RATIO >= n:
+            xs = x.tolist()
+            ys = y.tolist()
+            sizes = population.size[:n].tolist()
+        else:
+            xs = x
+            ys = y
+            sizes = population.size[:n]
+        living_sizes = population.size[:n][population.alive[:n]]
+        largest_size = living_sizes.max()
+        smallest_size = living_sizes.min()
+        out_of_energy = population.out_of_energy()
+        full = population.full()
+        active = ~out_of_energy & ~full
+        # every derived attribute is precomputed by the population, only the visited ones are read
+        slots = population.slotOf
+        food_by_id = self.simulation.food
+
+        creature_moved = False
+        profiler = self.profiler
+        threat_seconds = 0.0
+        food_seconds = 0.0
+
+        for slot, seeing_distance, flee_radius, prey_size, predator_size, movement_speed in zip(
+                visiting.tolist(), population.sightRadius[visiting].tolist(),
+                population.fleeRadius[visiting].tolist(), population.preySize[visiting].tolist(),
+                population.predatorSize[visiting].tolist(), population.stepLength[visiting].tolist()):
+
+            # creature is out of energy, it cannot move
+            if out_of_energy[slot]:
+                continue
+
+            # run away from larger creatures if they are too close
+            if scan_for_threats and largest_size >= predator_size:
+                if profiler:
+                    started = perf_counter()
+                population.hostileId[slot] = self.find_hostile(
+                    slot, flee_radius, predator_size, slots, xs, ys, sizes)
+                if profiler:
+                    threat_seconds += perf_counter() - started
+            elif scan_for_threats:
+                population.hostileId[slot] = -1
+
+            hostile = slots.get(int(population.hostileId[slot]))
+            if hostile is not None and active[hostile]:
+                target_x[slot] = x[hostile]
+                target_y[slot] = y[hostile]
+                direction[slot] = -1
+                population.targetKind[slot] = NO_TARGET
+                continue
+
+            # if the creature is full and safe, continue
+            if full[slot]:
+                continue
+
+            if profiler:
+                started = perf_counter()
+            kind, target_id, distance = self.find_food(
+                slot, seeing_distance, prey_size, slots, xs, ys, sizes, food_by_id, smallest_size)
+            if profiler:
+                food_seconds += perf_counter() - started
+            population.targetKind[slot] = kind
+            population.targetId[slot] = target_id
+
+            if kind != NO_TARGET:
+                if kind == FOOD_TARGET:
+                    target_x[slot] = food_by_id[target_id].x
+                    target_y[slot] = food_by_id[target_id].y
+                else:
+                    target_x[slot] = x[slots[target_id]]
+                    target_y[slot] = y[slots[target_id]]
+                direction[slot] = 1
+                chasing[slot] = True
+                creature_moved = True
+
+            elif distance_squared(xs[slot], ys[slot], self.center.x, self.center.y) > movement_speed * movement_speed:
+                # creature could not see food, move towards center
+                target_x[slot] = self.center.x
+                target_y[slot] = self.center.y
+                direction[slot] = 1
+                creature_moved = True
+
+        return creature_moved, threat_seconds, food_seconds
+
+    def find_food(self, slot, seeing_distance, prey_size, slots, xs, ys, sizes, food_by_id, smallest_size):
+        """See if the given creature can find food, returns the kind of
+           target, its id and its squared distance"""
+        population = self.simulation.creatures
+        kind = population.targetKind[slot]
+        target_id = int(population.targetId[slot])
+
+        # keep chasing the same target for as long as it exists and can be seen
+        distance = maxsize
+        if kind == FOOD_TARGET and target_id in food_by_id:
+            food = food_by_id[target_id]
+            distance = distance_squared(xs[slot], ys[slot], food.x, food.y)
+        elif kind == CREATURE_TARGET and target_id in slots:
+            prey = slots[target_id]
+            distance = distance_squared(xs[slot], ys[slot], xs[prey], ys[prey])
+        if distance < seeing_distance * seeing_distance:
+            return kind, target_id, distance
+
+        return self.find_closest_food(slot, seeing_distance, prey_size, slots, xs, ys, sizes,
+                                      food_by_id, smallest_size)
+
+    def move(self, target_x, target_y, direction):
+        """Move every creature with a direction along it and keep the grid of creatures up to date"""
+        self.simulation.creatures.move(target_x, target_y, direction, self.width, self.height)
+        self.simulation.update_creature_cells(np.flatnonzero(direction))
+
+    def reach(self):
+        """Returns how close each creature has to get to its target to eat it"""
+        population = self.simulation.creatures
+        return population.stepLength[:population.count] + self.BUFFER
+
+    def reaching(self, chasing, reach):
+        """Returns the slots of the chasing creatures which are close enough to
+           their target to eat it, in order"""
+        if self.kernel:
+            return self.kernel.reaching(self, chasing, reach)
+
+        population = self.simulation.creatures
+        slots = population.slotOf
+        food_by_id = self.simulation.food
+        reach_squared = reach * reach
+        found = []
+        for slot in np.flatnonzero(chasing).tolist():
+            target_id = int(population.targetId[slot])
+            if population.targetKind[slot] == FOOD_TARGET:
+                food = food_by_id.get(target_id)
+                if food is None or distance_squared(population.x[slot], population.y[slot],
+                                                    food.x, food.y) > reach_squared[slot]:
+                    continue
+            else:
+                prey = slots.get(target_id)
+                if prey is None or distance_squared(population.x[slot], population.y[slot],
+                                                    population.x[prey], population.y[prey]) > reach_squared[slot]:
+                    continue
+            found.append(slot)
+        return np.array(found, dtype=np.int64)
+
+    def eat(self, reaching, slots, food_by_id):
+        """Let each of the given creatures eat its target in turn, so when two
+           creatures reach the same target the first one gets it"""
+        population = self.simulation.creatures
+        for slot in reaching.tolist():
+            # this creature was eaten before it got to eat
+            if not population.alive[slot]:
+                continue
+            target_id = int(population.targetId[slot])
+            if population.targetKind[slot] == FOOD_TARGET:
+                if target_id not in food_by_id:
+                    continue
+            elif target_id not in slots:
+                continue
+            self.feed(slot, slots)
+
+    def remove_food(self, food_id):
+        """Take a piece of food out of the world, and out of the copy a kernel keeps of it"""
+        self.simulation.remove_food(food_id)
+        if self.kernel:
+            self.kernel.remove_food(food_id)
+
+    def feed(self, slot, slots):
+        """The given creature eats its target"""
+        population = self.simulation.creatures
+        target_id = int(population.targetId[slot])
+        if population.targetKind[slot] == FOOD_TARGET:
+            self.remove_food(target_id)
+        else:
+            self.simulation.kill_creature(slots[target_id])
+
+        population.eaten[slot] += 1
+        if self.events.wants(ATE):
+            self.events.record(ATE, self.simulation.generation, self.ticks,
+                               creature=int(population.ids[slot]), target=target_id,
+                               prey=bool(population.targetKind[slot] == CREATURE_TARGET),
+                               eaten=int(population.eaten[slot]))
+        population.targetKind[slot] = NO_TARGET
+
+    def reset_creatures(self):
+        """Reset creature state as well as deal with creature reproduction /
+           survival, for every creature at once"""
+        population = self.simulation.creatures
+        n = population.count
+        alive = population.alive[:n]
+        survived = (population.eaten[:n] >= 1) & alive
+        survivors = np.flatnonzero(survived)
+        # creatures which survived with enough food to reproduce
+        parents = np.flatnonzero(survived & population.full())
+
+        random = self.simulation.batch_random()
+        population.x[survivors], population.y[survivors] = self.random_perimeter_positions(
+            random, len(survivors))
+        offspring = self.place_creatures(
+            random, *population.offspring_attributes(parents, random))
+        population.reset_state(survivors)
+        if self.events.wants(BORN) or self.events.wants(PERISHED):
+            self.record_turnover(parents, offspring, np.flatnonzero(alive & ~survived))
+
+        self.simulation.update_creature_cells(survivors)
+
+        # offspring were added after the parents and all survive
+        keep = np.ones(population.count, dtype=bool)
+        keep[:n] = survived
+        self.simulation.keep_creatures(keep)
+
+    def record_turnover(self, parents, offspring, perished):
+        """Record who was born and who perished, in the order of the parents and the perished"""
+        population = self.simulation.creatures
+        children = dict(zip(parents.tolist(), offspring.tolist()))
+        for slot in np.union1d(parents, perished).tolist():
+            child = children.get(slot)
+            if child is None:  # creature did not find enough food
+                if self.events.wants(PERISHED):
+                    self.events.record(PERISHED, self.simulation.generation, self.ticks,
+                                       creature=int(population.ids[slot]))
+            elif self.events.wants(BORN):
+                self.events.record(BORN, self.simulation.generation, self.ticks,
+                                   creature=int(population.ids[child]),
+                                   parent=int(population.ids[slot]),
+                                   size=float(population.size[child]),
+                                   sight=float(population.sight[child]),
+                                   speed=float(population.speed[child]))
+
+    def next_generation(self):
+        """Replace the food and move the surviving creatures on to the next generation"""
+        if self.statistics:
+            self.statistics.record_generation(self)
+        profiler = self.profiler
+        if profiler:
+            started = perf_counter()
+        self.simulation.clear_food()
+        self.create_food(self.simulation.foodAmount)
+        if profiler:
+            profiler.add(FOOD_RESPAWN, perf_counter() - started)
+            started = perf_counter()
+        self.reset_creatures()
+        if profiler:
+            profiler.add(GENERATION_RESET, perf_counter() - started)
+            profiler.generations += 1
+        self.simulation.generation += 1
+        self.ticks = 0
+        self.record_generation()
+        if self.events.wants(GENERATION):
+            self.events.record(GENERATION, self.simulation.generation, self.ticks,
+                               population=self.simulation.population_size())
+
+    def record_generation(self):
+        """Hand the start of a generation to the recorder, if there is one"""
+        if self.recorder:
+            self.recorder.record_generation(self)
+            self.recorder.record_frame(self)
+
+    def run_generation(self, max_ticks=None):
+        """Step until the current generation is over, then start the next one"""
+        ticks = 0
+        while self.step():
+            ticks += 1
+            if max_ticks and ticks >= max_ticks:
+                break
+        self.next_generation()
+
+    def close(self):
+        """Release anything the engine holds on to besides the world, nothing for a plain engine"""
+
+    def is_extinct(self):
+        return self.simulation.population_size() == 0
+
+    def snapshot(self, bounds=None):
+        """Take a copy of the positions of everything in the world, or only of
+           what is near the (left, top, right, bottom) bounds if they are given.
+           Bounded snapshots are found through the spatial grids so their cost
+           depends on the size of the bounds rather than of the world"""
+        population = self.simulation.creatures
+        if bounds is not None:
+            food_by_id = self.simulation.food
+            slots = np.array([population.slotOf[creature_id] for creature_id in
+                              self.simulation.creatureGrid.query_rect(*bounds)], dtype=np.int64)
+            return Snapshot(
+                self.simulation.generation, self.ticks,
+                list(zip(population.ids[slots].tolist(),
+                         population.x[slots].tolist(), population.y[slots].tolist())),
+                [(food_id, food_by_id[food_id].x, food_by_id[food_id].y)
+                 for food_id in self.simulation.foodGrid.query_rect(*bounds)],
+                population.living)
+
+        n = population.count
+        alive = population.alive[:n]
+        return Snapshot(
+            self.simulation.generation, self.ticks,
+            list(zip(population.ids[:n][alive].tolist(),
+                     population.x[:n][alive].tolist(), population.y[:n][alive].tolist())),
+            [(food.id, food.x, food.y) for food in self.simulation.food.values()])
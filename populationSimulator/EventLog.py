@@ -0,0 +1,150 @@
+# File EventLog.py
+# Structured, lazily formatted log of what happens during a simulation
+
+from queue import SimpleQueue
+from threading import Thread
+import json
+import logging
+import time
+
+# kinds of event and the logging level each one is reported at
+BORN = 'born'
+PERISHED = 'perished'
+ATE = 'ate'
+FLED = 'fled'
+GENERATION = 'generation'
+
+EVENT_LEVELS = {
+    BORN: logging.INFO,
+    PERISHED: logging.INFO,
+    ATE: logging.INFO,
+    FLED: logging.DEBUG,
+    GENERATION: logging.INFO,
+}
+
+
+class LoggingSink:
+    """
+    Passes events on to the logging module. The event is only turned
+    into a string if the logger will actually write it out
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger('populationSimulator')
+
+    def wants(self, event):
+        return self.logger.isEnabledFor(EVENT_LEVELS[event])
+
+    def write(self, event, generation, tick, fields):
+        self.logger.log(EVENT_LEVELS[event], "generation %d tick %d %s %s",
+                        generation, tick, event, fields)
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """
+    Writes every event as one line of json. Events are handed to a
+    background thread which does the formatting and writing, so the
+    simulation only pays for putting the event on a queue
+    """
+
+    # number of lines written to the file at once
+    BATCH_SIZE = 1024
+
+    def __init__(self, path, events=tuple(EVENT_LEVELS)):
+        self.events = set(events)
+        self.queue = SimpleQueue()
+        self.file = open(path, 'w')
+        self.thread = Thread(target=self.write_events, daemon=True)
+        self.thread.start()
+
+    def wants(self, event):
+        return event in self.events
+
+    def write(self, event, generation, tick, fields):
+        self.queue.put((event, generation, tick, fields))
+
+    def write_events(self):
+        """Runs on the background thread until close() is called"""
+        lines = []
+        while True:
+            item = self.queue.get()
+            if item is not None:
+                event, generation, tick, fields = item
+                record = {'event': event, 'generation': generation, 'tick': tick}
+                record.update(fields)
+                lines.append(json.dumps(record))
+            if lines and (item is None or len(lines) >= self.BATCH_SIZE or self.queue.empty()):
+                self.file.write('\n'.join(lines) + '\n')
+                lines = []
+            if item is None:
+                return
+
+    def close(self):
+        """Write out everything still queued and close the file"""
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+
+class EventLog:
+    """
+    Collects the events of a simulation and hands them to its sinks.
+    Whether an event is wanted at all is decided once up front, so callers
+    can skip building an event entirely with a cheap wants() check.
+    Noisy events can be sampled (only every nth kept) or rate limited
+    (at most n per second)
+    """
+
+    def __init__(self, sinks=(), sample_every=None, max_per_second=None):
+        self.sinks = list(sinks)
+        self.sampleEvery = dict(sample_every or {})
+        self.maxPerSecond = dict(max_per_second or {})
+        self.seen = {event: 0 for event in EVENT_LEVELS}
+        self.windowStart = {event: 0.0 for event in EVENT_LEVELS}
+        self.windowCount = {event: 0 for event in EVENT_LEVELS}
+        self.refresh()
+
+    def refresh(self):
+        """Work out which events any sink wants, call again if a sink or logger changes"""
+        self.wanted = {event for event in EVENT_LEVELS
+                       if any(sink.wants(event) for sink in self.sinks)}
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        self.refresh()
+
+    def wants(self, event):
+        return event in self.wanted
+
+    def allowed(self, event):
+        """Apply the sampling and rate limit of an event, returns whether to keep it"""
+        self.seen[event] += 1
+        sample_every = self.sampleEvery.get(event)
+        if sample_every and self.seen[event] % sample_every != 0:
+            return False
+
+        max_per_second = self.maxPerSecond.get(event)
+        if max_per_second:
+            now = time.monotonic()
+            if now - self.windowStart[event] >= 1:
+                self.windowStart[event] = now
+                self.windowCount[event] = 0
+            if self.windowCount[event] >= max_per_second:
+                return False
+            self.windowCount[event] += 1
+        return True
+
+    def record(self, event, generation, tick, **fields):
+        """Hand an event to every sink which wants it, fields should be plain values"""
+        if event not in self.wanted or not self.allowed(event):
+            return
+        for sink in self.sinks:
+            if sink.wants(event):
+                sink.write(event, generation, tick, fields)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
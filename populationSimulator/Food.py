@@ -1,20 +1,18 @@
 # File Food.py
 
-from PyQt5.QtWidgets import QGraphicsPixmapItem
-from PyQt5.QtGui import QPixmap
-import random
 
-
-class Food(QGraphicsPixmapItem):
+class Food:
     """
-    Food to be drawn to the simulation window
+    A piece of food somewhere in the simulation world
     """
 
     # List of food images that can be spawned
     FOOD_IMAGES = ('Cherry.png', 'Watermelon.png', 'Pear.png')
 
-    def __init__(self, image=None):
-        if not image:
-            super().__init__(QPixmap('../assets/' + random.choice(self.FOOD_IMAGES)))
-        else:
-            super().__init__QGraphicsPixmapItem(image)
+    def __init__(self, x=0, y=0):
+        self.id = None
+        self.x = x
+        self.y = y
+
+    def __str__(self):
+        return "Food %s(x=%f y=%f)" % (self.id, self.x, self.y)
@@ -3,27 +3,46 @@
 
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
+from matplotlib import style
+import numpy as np
 from PyQt5.QtWidgets import QSizePolicy
 
 
 class Graph(FigureCanvas):
     """
-    A matplotlib graph intended to show changes in the population over 
-    generations. Works by averaging changes over the simulation instance 
+    A matplotlib graph intended to show changes in the population over
+    generations. Works by averaging changes over the simulation instance.
+    Each attribute has one persistent line whose data is appended to in
+    place, and only the lines are redrawn (blitted) each generation. The
+    whole figure is only redrawn when the axes have to grow
     """
 
+    # attribute name, line style and the simulation setting which enables it
+    ATTRIBUTES = (
+        ('speed', 'w-', 'enableSpeedMutation'),
+        ('size', 'r-', 'enableSizeMutation'),
+        ('sight', 'c-', 'enableSightMutation'),
+    )
+
+    INITIAL_CAPACITY = 256
+    INITIAL_GENERATIONS_SHOWN = 16
+    # headroom left above the largest value when the y axis grows
+    Y_MARGIN = 1.25
+
     def __init__(self, parent=None, width=5, height=4, dpi=100):
-        plt.style.use('dark_background')
+        style.use('dark_background')
         self.figure = Figure(figsize=(width, height), dpi=dpi)
 
         FigureCanvas.__init__(self, self.figure)
 
-        self.speed_history = [1]
-        self.size_history = [1]
-        self.sight_history = [1]
+        self.history = None
+        self.historyLength = 0
+        self.lines = {}
+        self.background = None
         self.ax = None
         self.simulation = None
+        self.reset_history()
+        self.mpl_connect('draw_event', self.on_draw)
 
         FigureCanvas.setSizePolicy(self,
                                    QSizePolicy.Expanding,
@@ -31,63 +50,101 @@ class Graph(FigureCanvas):
         FigureCanvas.updateGeometry(self)
         parent.addWidget(self)
 
-    def update_graph(self):
-        """Update the graph with any new information about the simulation"""
-
-        if not self.simulation or len(self.simulation.creatures) == 0:
-            return
-
-        if self.simulation.enableSizeMutation:
-            size = sum([creature.size for creature in self.simulation.creatures]
-                       ) / len(self.simulation.creatures)
-
-            self.size_history.append(size)
-            self.ax.plot(self.size_history, 'r-', label="size")
-
-        if self.simulation.enableSightMutation:
-            sight = sum([creature.sight for creature in self.simulation.creatures]
-                        ) / len(self.simulation.creatures)
+    def reset_history(self):
+        """Preallocate the history, every attribute starts off at 1"""
+        self.history = {name: np.ones(self.INITIAL_CAPACITY)
+                        for name, _, _ in self.ATTRIBUTES}
+        self.historyLength = 1
 
-            self.sight_history.append(sight)
-            self.ax.plot(self.sight_history, 'c-', label="sight")
+    def append_history(self, name, value):
+        history = self.history[name]
+        if self.historyLength == len(history):
+            history = np.concatenate((history, np.empty(len(history))))
+            self.history[name] = history
+        history[self.historyLength] = value
 
-        if self.simulation.enableSpeedMutation:
-            speed = sum([creature.speed for creature in self.simulation.creatures]
-                        ) / len(self.simulation.creatures)
+    def update_graph(self, averages):
+        """Add a generation to the graph given the average of each attribute"""
 
-            self.speed_history.append(speed)
-            self.ax.plot(self.speed_history, 'w-', label="speed")
+        if not self.simulation or not self.ax or None in averages.values():
+            return
 
-        self.draw()
+        for name in self.lines:
+            self.append_history(name, averages[name])
+        self.historyLength += 1
+
+        generations = np.arange(self.historyLength)
+        for name, line in self.lines.items():
+            line.set_data(generations, self.history[name][:self.historyLength])
+
+        if self.grow_axes():
+            # a full redraw captures a new background and draws the lines
+            self.draw()
+        else:
+            self.blit_lines()
+
+    def grow_axes(self):
+        """Extend the axes if the newest values do not fit, returns whether they changed"""
+        grew = False
+        _, x_max = self.ax.get_xlim()
+        if self.historyLength - 1 > x_max:
+            self.ax.set_xlim(0, 2 * x_max)
+            grew = True
+
+        _, y_max = self.ax.get_ylim()
+        newest = max([self.history[name][self.historyLength - 1]
+                      for name in self.lines], default=0)
+        if newest > y_max:
+            self.ax.set_ylim(0, newest * self.Y_MARGIN)
+            grew = True
+        return grew
+
+    def on_draw(self, event):
+        """After a full redraw, remember the background and draw the lines on top"""
+        if not self.ax:
+            return
+        self.background = self.copy_from_bbox(self.ax.bbox)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def blit_lines(self):
+        """Redraw only the lines on top of the saved background"""
+        if self.background is None:
+            self.draw()
+            return
+        self.restore_region(self.background)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        self.blit(self.ax.bbox)
 
     def reset_graph(self):
         """Clear the history of the graph and recreate plot"""
         if self.figure:
             self.figure.clear()
-        self.speed_history = [1]
-        self.size_history = [1]
-        self.sight_history = [1]
+        self.ax = None
+        self.lines = {}
+        self.background = None
+        self.reset_history()
 
     def set_simulation(self, simulation):
-        """Set the simulation for the instance of this graph"""
+        """Set the simulation for the instance of this graph, or the config of a recorded one"""
         self.simulation = simulation
 
     def create_axis(self):
         """Create the axis for the graph"""
         self.ax = self.figure.add_subplot(111)
         self.ax.set_title('Average creature attributes')
+        self.ax.set_xlim(0, self.INITIAL_GENERATIONS_SHOWN)
+        self.ax.set_ylim(0, self.Y_MARGIN)
 
         if not self.simulation:
             return
 
-        if self.simulation.enableSpeedMutation:
-            self.ax.plot(1, 'w-', label="speed")
-
-        if self.simulation.enableSizeMutation:
-            self.ax.plot(1, 'r-', label="size")
-
-        if self.simulation.enableSightMutation:
-            self.ax.plot(1, 'c-', label="sight")
+        for name, line_style, setting in self.ATTRIBUTES:
+            if getattr(self.simulation, setting):
+                # animated lines are left out of full redraws and blitted instead
+                self.lines[name], = self.ax.plot(
+                    self.history[name][:self.historyLength], line_style, label=name, animated=True)
 
         self.ax.legend(loc='upper left')
 
@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+# File Headless.py
+# Runs a simulation without a display, as fast as the CPU allows
+
+import argparse
+import logging
+import sys
+
+from populationSimulator.Checkpoint import CheckpointWriter, checkpoint_generation, restore
+from populationSimulator.Config import SimulationConfig
+from populationSimulator.Engine import Engine, BACKENDS, PYTHON_BACKEND, prepare_process
+from populationSimulator.EventLog import EventLog, JsonLinesSink, LoggingSink, EVENT_LEVELS
+from populationSimulator.Profiler import Profiler, format_report
+from populationSimulator.Recording import TrajectoryRecorder
+from populationSimulator.Simulation import Simulation
+from populationSimulator.Statistics import StatisticsWriter
+
+DEFAULT_CHECKPOINT_EVERY = 10
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+
+def event_limit(text):
+    """Parse an EVENT=N argument into an (event, N) pair"""
+    event, _, amount = text.partition('=')
+    if event not in EVENT_LEVELS or not amount.isdigit():
+        raise argparse.ArgumentTypeError(
+            "expected EVENT=N with EVENT one of %s" % ', '.join(EVENT_LEVELS))
+    return event, int(amount)
+
+
+def positive_integer(text):
+    if not text.isdigit() or int(text) == 0:
+        raise argparse.ArgumentTypeError("expected a positive whole number, got " + text)
+    return int(text)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run a population simulation without a display")
+    parser.add_argument("--generations", type=int, default=100,
+                        help="generation to simulate up to, a resumed run counts those before the checkpoint")
+    parser.add_argument("--config", default=None, metavar="FILE",
+                        help="json file of settings to run with, the options below override it")
+    parser.add_argument("--save-config", default=None, metavar="FILE",
+                        help="write the settings of the run, including its seed, to this file")
+    parser.add_argument("--food", type=int, default=None,
+                        help="amount of food spawned each generation")
+    parser.add_argument("--population", type=int, default=None,
+                        help="number of creatures in the first generation")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the random number generator, chosen at random if not given")
+    parser.add_argument("--record", default=None, metavar="DIRECTORY",
+                        help="record every time step to this directory for later playback")
+    parser.add_argument("--events", default=None, metavar="FILE",
+                        help="write every simulation event to this file as json lines")
+    parser.add_argument("--sample", type=event_limit, action='append', default=[], metavar="EVENT=N",
+                        help="only keep every Nth event of a kind, for example fled=100")
+    parser.add_argument("--rate-limit", type=event_limit, action='append', default=[], metavar="EVENT=N",
+                        help="keep at most N events of a kind per second")
+    parser.add_argument("--log-level", type=str.upper, choices=LOG_LEVELS, default="WARNING",
+                        help="level of the events written to the log, INFO logs most events")
+    parser.add_argument("--statistics", default=None, metavar="FILE",
+                        help="write a csv row summarising every generation to this file")
+    parser.add_argument("--checkpoint", default=None, metavar="FILE",
+                        help="save the whole simulation to this file every so many generations and at the end")
+    parser.add_argument("--checkpoint-every", type=positive_integer, default=DEFAULT_CHECKPOINT_EVERY,
+                        metavar="N", help="generations between checkpoints")
+    parser.add_argument("--resume", default=None, metavar="FILE",
+                        help="carry on from a checkpoint, its settings replace --config, --food, "
+                             "--population, --seed and the world size")
+    parser.add_argument("--profile", action='store_true',
+                        help="print the time taken by each phase of the simulation at the end")
+    parser.add_argument("--workers", type=positive_integer, default=1,
+                        help="processes sharing each time step, for very large worlds")
+    parser.add_argument("--backend", choices=BACKENDS, default=PYTHON_BACKEND,
+                        help="how creatures decide where to head, numba compiles the decisions if it "
+                             "is installed and gives the same run as python")
+    parser.add_argument("--width", type=int, default=None,
+                        help="width of the world")
+    parser.add_argument("--height", type=int, default=None,
+                        help="height of the world")
+    return parser.parse_args(argv)
+
+
+def run(engine, generations, checkpoint_path=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+    """Run a simulation until it reaches a generation or every creature has died,
+       saving a checkpoint every so many generations if given a path"""
+    simulation = engine.simulation
+    checkpoints = CheckpointWriter() if checkpoint_path else None
+    print("seed %d" % simulation.seed)
+    while simulation.generation < generations:
+        engine.run_generation()
+        print("generation %d population %d" %
+              (simulation.generation, simulation.population_size()))
+        if engine.is_extinct():
+            break
+        if checkpoints and simulation.generation % checkpoint_every == 0:
+            checkpoints.save(engine, checkpoint_path)
+    if checkpoints:
+        checkpoints.save(engine, checkpoint_path)
+        checkpoints.close()
+    if engine.recorder:
+        engine.recorder.close()
+    engine.events.close()
+    engine.close()
+    if engine.statistics:
+        engine.statistics.close()
+    if engine.profiler:
+        print("\n".join(format_report(engine.profiler.report())))
+    return engine
+
+
+def create_config(arguments):
+    """The config file given, if any, with the settings given as options changed"""
+    config = SimulationConfig.load(arguments.config) if arguments.config else SimulationConfig()
+    changes = {'food_amount': arguments.food, 'starting_population': arguments.population,
+               'seed': arguments.seed, 'width': arguments.width, 'height': arguments.height}
+    return config.replace(**{key: value for key, value in changes.items() if value is not None})
+
+
+def create_engine(arguments):
+    """Create the engine the arguments ask for, carrying on from a checkpoint when resuming"""
+    events = EventLog([LoggingSink()], sample_every=dict(arguments.sample),
+                      max_per_second=dict(arguments.rate_limit))
+    if arguments.events:
+        events.add_sink(JsonLinesSink(arguments.events))
+    profiler = Profiler() if arguments.profile else None
+
+    if arguments.resume:
+        statistics = None
+        try:
+            if arguments.statistics:
+                statistics = StatisticsWriter(arguments.statistics,
+                                              checkpoint_generation(arguments.resume))
+            engine = restore(arguments.resume, events=events, profiler=profiler,
+                             statistics=statistics, workers=arguments.workers, backend=arguments.backend)
+        except (OSError, ValueError) as error:
+            sys.exit("Cannot resume: " + str(error))
+    else:
+        try:
+            config = create_config(arguments)
+        except ValueError as error:
+            sys.exit("Invalid settings: " + str(error))
+        except OSError as error:
+            sys.exit("Cannot read config: " + str(error))
+        simulation = Simulation(config)
+        statistics = None
+        if arguments.statistics:
+            statistics = StatisticsWriter(arguments.statistics)
+        if arguments.workers > 1:
+            from populationSimulator.Sharding import ShardedEngine
+            engine = ShardedEngine(simulation, config.width, config.height, events=events,
+                                   profiler=profiler, statistics=statistics, workers=arguments.workers,
+                                   backend=arguments.backend)
+        else:
+            engine = Engine(simulation, config.width, config.height, events=events,
+                            profiler=profiler, statistics=statistics, backend=arguments.backend)
+        engine.populate()
+
+    if arguments.save_config:
+        engine.simulation.config.save(arguments.save_config)
+    if arguments.record:
+        engine.recorder = TrajectoryRecorder(
+            arguments.record, engine.simulation, engine.width, engine.height)
+        engine.record_generation()
+    return engine
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    logging.basicConfig(level=arguments.log_level)
+    arguments.backend = prepare_process(arguments.backend)
+
+    run(create_engine(arguments), arguments.generations,
+        arguments.checkpoint, arguments.checkpoint_every)
@@ -0,0 +1,329 @@
+# File Kernel.py
+# Compiled versions of the decisions made by Engine.decide and Engine.eat, needs numba
+
+from time import perf_counter
+from numba import njit
+import numpy as np
+
+from populationSimulator.Population import NO_TARGET, FOOD_TARGET, CREATURE_TARGET
+
+
+def build_grid(x, y, cell_size, members):
+    """
+    Bucket the given entries of x and y into cells the same way a
+    SpatialGrid does, as arrays a compiled kernel can read. Returns the
+    cell size, first column and row and the numbers of columns and rows,
+    then the sorted members and where the members of each cell start.
+    Cells are numbered column by column, and only those between the first
+    and last occupied cell exist
+    """
+    columns = np.floor(x[members] / cell_size).astype(np.int64)
+    rows = np.floor(y[members] / cell_size).astype(np.int64)
+    if len(members) == 0:
+        return (cell_size, 0, 0, 1, 1), members, np.zeros(2, dtype=np.int64)
+    first_column = columns.min()
+    first_row = rows.min()
+    column_count = columns.max() - first_column + 1
+    row_count = rows.max() - first_row + 1
+    cells = (columns - first_column) * row_count + (rows - first_row)
+    starts = np.zeros(column_count * row_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cells, minlength=column_count * row_count), out=starts[1:])
+    return ((cell_size, int(first_column), int(first_row), int(column_count), int(row_count)),
+            members[np.argsort(cells, kind='stable')], starts)
+
+
+@njit(cache=True)
+def cell_span(position, radius, cell_size, first, count):
+    """The cells of a grid overlapping position plus or minus radius along one axis, as a range"""
+    low = max(int(np.floor((position - radius) / cell_size)) - first, 0)
+    high = min(int(np.floor((position + radius) / cell_size)) - first, count - 1)
+    return low, high + 1
+
+
+@njit(cache=True)
+def cell_spans(x, y, radius, grid):
+    """The columns and rows of a grid overlapping the square around (x, y) with half width radius"""
+    cell_size, first_column, first_row, column_count, row_count = grid
+    low_column, high_column = cell_span(x, radius, cell_size, first_column, column_count)
+    low_row, high_row = cell_span(y, radius, cell_size, first_row, row_count)
+    return low_column, high_column, low_row, high_row
+
+
+@njit(cache=True)
+def find_index(ids, present, entity_id):
+    """The index of an entity in an array of ids sorted in ascending order, or -1 if it has gone"""
+    index = np.searchsorted(ids, entity_id)
+    if index < len(ids) and ids[index] == entity_id and present[index]:
+        return index
+    return -1
+
+
+@njit(cache=True)
+def scan_threats(visiting, out_of_energy, ids, x, y, size, flee_radius, predator_size, largest_size,
+                 hostile_id, grid, members, starts):
+    """Engine.find_hostile for every visited creature that can move, writing into hostile_id"""
+    row_count = grid[4]
+    for slot in visiting:
+        if out_of_energy[slot]:
+            continue
+        hostile = -1
+        if largest_size >= predator_size[slot]:
+            radius = flee_radius[slot]
+            danger_squared = radius * radius
+            low_column, high_column, low_row, high_row = cell_spans(x[slot], y[slot], radius, grid)
+            for column in range(low_column, high_column):
+                for row in range(low_row, high_row):
+                    cell = column * row_count + row
+                    for other in members[starts[cell]:starts[cell + 1]]:
+                        # of several hostiles the oldest is kept
+                        if hostile != -1 and ids[other] > hostile:
+                            continue
+                        if other != slot and size[other] >= predator_size[slot]:
+                            delta_x = x[other] - x[slot]
+                            delta_y = y[other] - y[slot]
+                            if delta_x * delta_x + delta_y * delta_y <= danger_squared:
+                                hostile = ids[other]
+        hostile_id[slot] = hostile
+
+
+@njit(cache=True)
+def choose_targets(visiting, out_of_energy, full, active, ids, alive, x, y, size, seeing_distance,
+                   seeing_squared, prey_size, movement_squared, smallest_size, hostile_id, target_kind,
+                   target_id, center_x, center_y, target_x, target_y, direction, chasing,
+                   creature_grid, creature_members, creature_starts,
+                   food_ids, food_present, food_x, food_y, food_grid, food_members, food_starts):
+    """The rest of Engine.decide once threats have been scanned for, returns whether any
+       creature is moving towards something"""
+    creature_moved = False
+    row_count = creature_grid[4]
+    food_row_count = food_grid[4]
+    for slot in visiting:
+        if out_of_energy[slot]:
+            continue
+
+        hostile = find_index(ids, alive, hostile_id[slot])
+        if hostile != -1 and active[hostile]:
+            target_x[slot] = x[hostile]
+            target_y[slot] = y[hostile]
+            direction[slot] = -1
+            target_kind[slot] = NO_TARGET
+            continue
+
+        if full[slot]:
+            continue
+
+        # keep chasing the same target for as long as it exists and can be seen
+        kind = NO_TARGET
+        closest_id = -1
+        closest_x = 0.0
+        closest_y = 0.0
+        if target_kind[slot] == FOOD_TARGET:
+            index = find_index(food_ids, food_present, target_id[slot])
+            if index != -1:
+                kind = FOOD_TARGET
+                closest_id = food_ids[index]
+                closest_x = food_x[index]
+                closest_y = food_y[index]
+        elif target_kind[slot] == CREATURE_TARGET:
+            index = find_index(ids, alive, target_id[slot])
+            if index != -1:
+                kind = CREATURE_TARGET
+                closest_id = ids[index]
+                closest_x = x[index]
+                closest_y = y[index]
+
+        if kind != NO_TARGET:
+            delta_x = closest_x - x[slot]
+            delta_y = closest_y - y[slot]
+            if delta_x * delta_x + delta_y * delta_y >= seeing_squared[slot]:
+                kind = NO_TARGET
+                closest_id = -1
+
+        if kind == NO_TARGET:
+            # the closest food or smaller creature in sight, ties go to food and then to the oldest
+            closest = seeing_squared[slot]
+            radius = seeing_distance[slot]
+            low_column, high_column, low_row, high_row = cell_spans(x[slot], y[slot], radius, food_grid)
+            for column in range(low_column, high_column):
+                for row in range(low_row, high_row):
+                    cell = column * food_row_count + row
+                    for index in food_members[food_starts[cell]:food_starts[cell + 1]]:
+                        if not food_present[index]:
+                            continue
+                        delta_x = food_x[index] - x[slot]
+                        delta_y = food_y[index] - y[slot]
+                        distance = delta_x * delta_x + delta_y * delta_y
+                        if distance < closest or (distance == closest and kind == FOOD_TARGET
+                                                  and food_ids[index] < closest_id):
+                            kind = FOOD_TARGET
+                            closest_id = food_ids[index]
+                            closest_x = food_x[index]
+                            closest_y = food_y[index]
+                            closest = distance
+
+            if smallest_size <= prey_size[slot]:
+                low_column, high_column, low_row, high_row = cell_spans(x[slot], y[slot], radius,
+                                                                        creature_grid)
+                for column in range(low_column, high_column):
+                    for row in range(low_row, high_row):
+                        cell = column * row_count + row
+                        for other in creature_members[creature_starts[cell]:creature_starts[cell + 1]]:
+                            if other == slot or size[other] > prey_size[slot]:
+                                continue
+                            delta_x = x[other] - x[slot]
+                            delta_y = y[other] - y[slot]
+                            distance = delta_x * delta_x + delta_y * delta_y
+                            if distance < closest or (distance == closest and kind == CREATURE_TARGET
+                                                      and ids[other] < closest_id):
+                                kind = CREATURE_TARGET
+                                closest_id = ids[other]
+                                closest_x = x[other]
+                                closest_y = y[other]
+                                closest = distance
+
+        target_kind[slot] = kind
+        target_id[slot] = closest_id
+
+        if kind != NO_TARGET:
+            target_x[slot] = closest_x
+            target_y[slot] = closest_y
+            direction[slot] = 1
+            chasing[slot] = True
+            creature_moved = True
+        else:
+            delta_x = center_x - x[slot]
+            delta_y = center_y - y[slot]
+            if delta_x * delta_x + delta_y * delta_y > movement_squared[slot]:
+                # creature could not see food, move towards center
+                target_x[slot] = center_x
+                target_y[slot] = center_y
+                direction[slot] = 1
+                creature_moved = True
+
+    return creature_moved
+
+
+@njit(cache=True)
+def find_reaching(chasing, ids, alive, x, y, target_kind, target_id, reach_squared,
+                  food_ids, food_present, food_x, food_y):
+    """Engine.reaching, returns the slots of the chasing creatures close enough to their target to eat it"""
+    reaching = np.empty(len(chasing), dtype=np.int64)
+    count = 0
+    for slot in np.flatnonzero(chasing):
+        if target_kind[slot] == FOOD_TARGET:
+            index = find_index(food_ids, food_present, target_id[slot])
+            if index == -1:
+                continue
+            delta_x = food_x[index] - x[slot]
+            delta_y = food_y[index] - y[slot]
+        else:
+            prey = find_index(ids, alive, target_id[slot])
+            if prey == -1:
+                continue
+            delta_x = x[prey] - x[slot]
+            delta_y = y[prey] - y[slot]
+        if delta_x * delta_x + delta_y * delta_y > reach_squared[slot]:
+            continue
+        reaching[count] = slot
+        count += 1
+    return reaching[:count]
+
+
+class CompiledKernel:
+    """
+    Makes the decisions of Engine.decide, and works out who can reach
+    their target in Engine.reaching, with compiled loops over the arrays
+    of the population instead of the spatial grids and the food
+    dictionary, giving exactly the same outcome. The grid of creatures
+    is rebuilt from their positions every step. The food is copied into
+    arrays whenever the simulation replaces its food dictionary, which
+    happens once a generation, and after that only loses what
+    Engine.remove_food tells it was eaten. Everything is compiled on first use and cached on
+    disk, see prepare_process() in Engine for doing that ahead of a run
+    """
+
+    def __init__(self):
+        self.food = None  # the food dictionary the arrays were copied from
+        self.foodCount = 0
+        self.foodIds = None
+        self.foodPresent = None
+        self.foodX = None
+        self.foodY = None
+        self.foodGrid = None
+        self.foodMembers = None
+        self.foodStarts = None
+
+    def update_food(self, food_by_id, cell_size):
+        if food_by_id is not self.food or len(food_by_id) > self.foodCount:
+            count = len(food_by_id)
+            ids = np.fromiter(food_by_id, np.int64, count)
+            order = np.argsort(ids)
+            self.foodIds = ids[order]
+            self.foodX = np.fromiter((food.x for food in food_by_id.values()), np.float64, count)[order]
+            self.foodY = np.fromiter((food.y for food in food_by_id.values()), np.float64, count)[order]
+            self.foodPresent = np.ones(count, dtype=np.bool_)
+            self.foodGrid, self.foodMembers, self.foodStarts = build_grid(
+                self.foodX, self.foodY, cell_size, np.arange(count))
+            self.food = food_by_id
+        elif len(food_by_id) < self.foodCount:
+            # food is only ever taken away during a generation, here by something other than remove_food()
+            self.foodPresent = np.fromiter((food_id in food_by_id for food_id in self.foodIds.tolist()),
+                                           np.bool_, len(self.foodIds))
+        self.foodCount = len(food_by_id)
+
+    def decide(self, engine, visiting, scan_for_threats, target_x, target_y, direction, chasing, nearby=None):
+        """Does the same as Engine.decide. Only the creatures in the nearby slots are
+           looked for if they are given, which have to include everything in sight"""
+        simulation = engine.simulation
+        population = simulation.creatures
+        n = population.count
+        ids = population.ids[:n]
+        alive = population.alive[:n]
+        x = population.x[:n]
+        y = population.y[:n]
+        size = population.size[:n]
+        living_sizes = size[alive]
+        out_of_energy = population.out_of_energy()
+        full = population.full()
+        grid, members, starts = build_grid(x, y, float(simulation.creatureGrid.cellSize),
+                                           np.flatnonzero(alive) if nearby is None else nearby)
+
+        threat_seconds = 0.0
+        if scan_for_threats:
+            started = perf_counter()
+            scan_threats(visiting, out_of_energy, ids, x, y, size, population.fleeRadius[:n],
+                         population.predatorSize[:n], living_sizes.max(), population.hostileId,
+                         grid, members, starts)
+            threat_seconds = perf_counter() - started
+
+        started = perf_counter()
+        self.update_food(simulation.food, float(simulation.foodGrid.cellSize))
+        movement_speed = population.stepLength[:n]
+        creature_moved = choose_targets(
+            visiting, out_of_energy, full, ~out_of_energy & ~full, ids, alive, x, y, size,
+            population.sightRadius[:n], population.sightSquared[:n], population.preySize[:n],
+            movement_speed * movement_speed, living_sizes.min(), population.hostileId,
+            population.targetKind, population.targetId, engine.center.x, engine.center.y,
+            target_x, target_y, direction, chasing, grid, members, starts,
+            self.foodIds, self.foodPresent, self.foodX, self.foodY, self.foodGrid,
+            self.foodMembers, self.foodStarts)
+        return bool(creature_moved), threat_seconds, perf_counter() - started
+
+    def reaching(self, engine, chasing, reach):
+        """Does the same as Engine.reaching"""
+        simulation = engine.simulation
+        population = simulation.creatures
+        n = population.count
+        self.update_food(simulation.food, float(simulation.foodGrid.cellSize))
+        return find_reaching(chasing, population.ids[:n], population.alive[:n], population.x[:n],
+                             population.y[:n], population.targetKind[:n], population.targetId[:n],
+                             reach * reach, self.foodIds, self.foodPresent, self.foodX, self.foodY)
+
+    def remove_food(self, food_id):
+        """Mark a piece of food of the arrays as eaten"""
+        if self.food is None:
+            return
+        index = find_index(self.foodIds, self.foodPresent, food_id)
+        if index != -1:
+            self.foodPresent[index] = False
+            self.foodCount -= 1
@@ -8,8 +8,10 @@ import qdarkstyle
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from PyQt5.uic import loadUi
 
+from populationSimulator.Assets import asset_path
+from populationSimulator.Config import SimulationConfig
 from populationSimulator.SimulationView import SimulationView
-from populationSimulator.Util import FUNCTION_STRINGS
+from populationSimulator.Util import FUNCTION_STRINGS, SPEED_STRINGS, WORLD_SIZE_STRINGS
 
 
 class MainWindow(QMainWindow):
@@ -19,10 +21,26 @@ class MainWindow(QMainWindow):
 
     def __init__(self):
         super(MainWindow, self).__init__()
-        loadUi("../assets/mainwindow.ui", self)
+        loadUi(asset_path("mainwindow.ui"), self)
         self.populate_cost_combo_box()
+        self.populate_speed_combo_box()
+        self.populate_world_size_combo_box()
         self.show()
 
+    def simulation_config(self):
+        """The settings currently chosen in the window, the world size is left to the view"""
+        return SimulationConfig(
+            enable_size_mutation=self.enable_size_mutation.isChecked(),
+            enable_sight_mutation=self.enable_sight_mutation.isChecked(),
+            enable_speed_mutation=self.enable_speed_mutation.isChecked(),
+            speed_cost_exponent=FUNCTION_STRINGS.index(
+                self.speed_cost_function_comboBox.currentText()),
+            sight_cost_exponent=FUNCTION_STRINGS.index(
+                self.sight_cost_function_comboBox.currentText()),
+            size_cost_exponent=FUNCTION_STRINGS.index(
+                self.size_cost_function_comboBox.currentText()),
+            food_amount=self.food_slider.sliderPosition())
+
     def populate_cost_combo_box(self):
         """Populate and set the initial values for the QComboBoxes"""
         speed_combo_box = self.speed_cost_function_comboBox
@@ -39,11 +57,24 @@ class MainWindow(QMainWindow):
         sight_combo_box.setCurrentIndex(1)
         size_combo_box.setCurrentIndex(3)
 
+    def populate_speed_combo_box(self):
+        """Populate the simulation speed QComboBox, starting at real time"""
+        for speed in SPEED_STRINGS:
+            self.simulation_speed_comboBox.addItem(speed)
+        self.simulation_speed_comboBox.setCurrentIndex(0)
+
+    def populate_world_size_combo_box(self):
+        """Populate the world size QComboBox, starting at the size of the window"""
+        for world_size in WORLD_SIZE_STRINGS:
+            self.world_size_comboBox.addItem(world_size)
+        self.world_size_comboBox.setCurrentIndex(0)
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
 
-    logging.basicConfig(filename='debug.log', filemode='w', level=logging.INFO)
+    # simulation events are logged at INFO and DEBUG, lower the level to see them
+    logging.basicConfig(filename='debug.log', filemode='w', level=logging.WARNING)
 
     # setup stylesheet
     app.setStyleSheet(qdarkstyle.load_stylesheet_pyqt5())
@@ -0,0 +1,234 @@
+# File Population.py
+# Stores every creature of a simulation as columns of contiguous arrays
+
+import numpy as np
+
+from populationSimulator.Config import SimulationConfig
+from populationSimulator.Util import movement_deltas
+
+# kinds of object a creature can be chasing
+NO_TARGET = 0
+FOOD_TARGET = 1
+CREATURE_TARGET = 2
+
+
+class Population:
+    """
+    Holds the attributes and positions of all creatures in NumPy arrays,
+    one entry per creature, so that per time step work such as movement
+    and energy expenditure can be done for every creature at once.
+    Only the first `count` entries of each array are in use.
+    Creatures which die are only flagged as dead so the slots of the
+    others stay put, the dead are discarded in bulk by keep().
+    The attributes of a creature never change once it is added, so
+    everything derived from them is worked out once in add_many()
+    """
+
+    INITIAL_CAPACITY = 64
+
+    # name and type of every per creature array
+    COLUMNS = (
+        ('ids', np.int64),
+        ('alive', np.bool_),
+        ('x', np.float64),
+        ('y', np.float64),
+        ('size', np.float64),
+        ('sight', np.float64),
+        ('speed', np.float64),
+        ('energy', np.float64),
+        ('eaten', np.int32),
+        ('targetKind', np.int8),
+        ('targetId', np.int64),
+        ('hostileId', np.int64),
+        # can still act this generation, see Engine.step
+        ('acting', np.bool_),
+        # derived from the attributes when a creature is added
+        ('energyCost', np.float64),  # energy spent per time step moved
+        ('sightRadius', np.float64),
+        ('sightSquared', np.float64),
+        ('stepLength', np.float64),  # distance moved per time step
+        ('fleeRadius', np.float64),  # run from larger creatures this close
+        ('preySize', np.float64),  # creatures up to this size can be eaten
+        ('predatorSize', np.float64),  # creatures from this size can eat this one
+    )
+
+    def __init__(self, config=None, capacity=INITIAL_CAPACITY):
+        # the creature constants and cost functions come from the config
+        self.config = config or SimulationConfig()
+        self.count = 0
+        self.living = 0
+        self.capacity = capacity
+        self.slotOf = {}  # id -> slot of every living creature
+        for name, dtype in self.COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def __len__(self):
+        return self.living
+
+    def _grow(self, capacity):
+        """Reallocate every array so that at least capacity creatures fit"""
+        for name, _ in self.COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def add_many(self, creature_ids, x, y, size, sight, speed):
+        """Add a new creature with full energy for every entry of the given
+           arrays, returns the slots they were stored in"""
+        count = len(creature_ids)
+        capacity = self.capacity
+        while self.count + count > capacity:
+            capacity *= 2
+        if capacity != self.capacity:
+            self._grow(capacity)
+
+        slots = np.arange(self.count, self.count + count)
+        size = np.asarray(size, dtype=np.float64)
+        sight = np.asarray(sight, dtype=np.float64)
+        speed = np.asarray(speed, dtype=np.float64)
+        self.ids[slots] = creature_ids
+        self.alive[slots] = True
+        self.slotOf.update(zip(self.ids[slots].tolist(), slots.tolist()))
+        self.x[slots] = x
+        self.y[slots] = y
+        self.size[slots] = size
+        self.sight[slots] = sight
+        self.speed[slots] = speed
+        config = self.config
+        self.energyCost[slots] = (np.power(speed, config.speedCostExponent) * np.power(size, config.sizeCostExponent) +
+                                  np.power(sight, config.sightCostExponent))
+        self.sightRadius[slots] = sight * config.sightModifier
+        self.sightSquared[slots] = self.sightRadius[slots] * self.sightRadius[slots]
+        self.stepLength[slots] = speed * config.speedModifier
+        self.fleeRadius[slots] = np.minimum(self.sightRadius[slots], config.dangerZone)
+        self.preySize[slots] = size / config.eatSize
+        self.predatorSize[slots] = size * config.eatSize
+        self.count += count
+        self.living += count
+        self.reset_state(slots)
+        return slots
+
+    def restore(self, columns, count):
+        """Take over the first count entries of the given arrays, a dictionary of column name to array"""
+        self._grow(max(count, self.INITIAL_CAPACITY))
+        for name, dtype in self.COLUMNS:
+            getattr(self, name)[:count] = np.asarray(columns[name][:count], dtype=dtype)
+        self.set_count(count)
+
+    def attach(self, columns, count):
+        """Use the given arrays as the columns without copying them, so the
+           population is a view of creatures kept somewhere else"""
+        for name, _ in self.COLUMNS:
+            setattr(self, name, columns[name])
+        self.capacity = len(self.ids)
+        self.set_count(count)
+
+    def set_count(self, count):
+        """Work out which creatures are living from the first count entries of the columns"""
+        self.count = count
+        alive = self.alive[:count]
+        self.living = int(np.count_nonzero(alive))
+        self.slotOf = dict(zip(self.ids[:count][alive].tolist(),
+                               np.flatnonzero(alive).tolist()))
+
+    def offspring_attributes(self, parent_slots, random):
+        """Returns the sizes, sights and speeds of a child of each of the given
+           creatures, allowing for natural mutations drawn from a NumPy generator"""
+        config = self.config
+        size = self.size[parent_slots]
+        sight = self.sight[parent_slots]
+        speed = self.speed[parent_slots]
+        mutation = config.mutationRange
+        if config.enableSpeedMutation:
+            speed = np.maximum(random.uniform(speed - mutation, speed + mutation), config.minSpeed)
+        if config.enableSightMutation:
+            sight = np.maximum(random.uniform(sight - mutation, sight + mutation), config.minSight)
+        if config.enableSizeMutation:
+            size = np.maximum(random.uniform(size - mutation, size + mutation), config.minSize)
+        return size, sight, speed
+
+    def reset_state(self, slot):
+        """Set a creature, or an array of them, back to its starting state"""
+        self.energy[slot] = self.config.startingEnergy
+        self.eaten[slot] = 0
+        self.targetKind[slot] = NO_TARGET
+        self.targetId[slot] = -1
+        self.hostileId[slot] = -1
+        self.acting[slot] = True
+
+    def kill(self, slot):
+        """Flag a creature as dead, its slot is reclaimed by the next keep()"""
+        self.alive[slot] = False
+        self.acting[slot] = False
+        del self.slotOf[int(self.ids[slot])]
+        self.living -= 1
+
+    def forget(self, creature_ids):
+        """Stop counting the given creatures as living, for a population which is a
+           view of creatures killed somewhere else"""
+        for creature_id in creature_ids:
+            del self.slotOf[creature_id]
+        self.living -= len(creature_ids)
+
+    def keep(self, mask):
+        """Discard every dead creature and every creature whose entry in mask
+           is False, preserving order. This moves creatures to new slots"""
+        mask = mask & self.alive[:self.count]
+        kept = int(np.count_nonzero(mask))
+        for name, _ in self.COLUMNS:
+            column = getattr(self, name)
+            column[:kept] = column[:self.count][mask]
+        self.count = kept
+        self.living = kept
+        self.slotOf = dict(zip(self.ids[:kept].tolist(), range(kept)))
+
+    def attribute_means(self):
+        """Returns the average size, sight and speed of the living creatures"""
+        alive = self.alive[:self.count]
+        if not alive.any():
+            return {'size': None, 'sight': None, 'speed': None}
+        return {name: float(getattr(self, name)[:self.count][alive].mean())
+                for name in ('size', 'sight', 'speed')}
+
+    def out_of_energy(self):
+        """Returns which creatures cannot move any more, the dead included"""
+        return (self.energy[:self.count] <= 0) | ~self.alive[:self.count]
+
+    def full(self):
+        return self.eaten[:self.count] >= self.config.foodToReproduce
+
+    def update_acting(self, slots):
+        """Work out again whether the given creatures can still act. A creature
+           stops acting once it is out of energy, and while it is full and not
+           running from anything"""
+        self.acting[slots] = (self.alive[slots] & (self.energy[slots] > 0) &
+                              ((self.eaten[slots] < self.config.foodToReproduce) | (self.hostileId[slots] != -1)))
+
+    def move(self, target_x, target_y, direction, width, height):
+        """
+        Move every creature one step towards (direction 1) or away from
+        (direction -1) its target, clamped to the bounds of the world.
+        Creatures with a direction of 0 stay where they are.
+        Each creature that moves spends its energy cost
+        """
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        delta_x, delta_y = movement_deltas(x, y, target_x, target_y,
+                                           self.stepLength[:n] * direction)
+        np.clip(x + delta_x, 0, width, out=x)
+        np.clip(y + delta_y, 0, height, out=y)
+        moving = direction != 0
+        self.energy[:n][moving] -= self.energyCost[:n][moving]
+
+    def move_slots(self, slots, target_x, target_y, direction, width, height):
+        """move() for only the given creatures, which all move. The targets and
+           directions are given for these creatures alone"""
+        x = self.x[slots]
+        y = self.y[slots]
+        delta_x, delta_y = movement_deltas(x, y, target_x, target_y, self.stepLength[slots] * direction)
+        self.x[slots] = np.clip(x + delta_x, 0, width)
+        self.y[slots] = np.clip(y + delta_y, 0, height)
+        self.energy[slots] -= self.energyCost[slots]
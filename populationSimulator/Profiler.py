@@ -0,0 +1,78 @@
+# File Profiler.py
+# Low overhead timing of each phase of a simulation
+
+from time import perf_counter
+
+# phases of a time step
+THREAT_SCAN = 'threat scan'
+FOOD_SEARCH = 'food search'
+MOVEMENT = 'movement'
+EATING = 'eating'
+# phases of a generation turnover
+GENERATION_RESET = 'generation reset'
+FOOD_RESPAWN = 'food respawn'
+# phases of the display
+RENDER = 'render'
+GRAPH_UPDATE = 'graph update'
+
+PHASES = (THREAT_SCAN, FOOD_SEARCH, MOVEMENT, EATING,
+          GENERATION_RESET, FOOD_RESPAWN, RENDER, GRAPH_UPDATE)
+
+
+class Profiler:
+    """
+    Accumulates the time spent in each phase of a simulation along with
+    how often each phase ran. Callers time a phase themselves and hand
+    over the seconds, so an engine without a profiler pays nothing.
+    Totals only ever grow, compare two reports to get a rate over a
+    window. Each phase should only be added to from a single thread
+    """
+
+    def __init__(self):
+        self.seconds = {phase: 0.0 for phase in PHASES}
+        self.calls = {phase: 0 for phase in PHASES}
+        self.ticks = 0
+        self.generations = 0
+        self.started = perf_counter()
+
+    def add(self, phase, seconds, calls=1):
+        self.seconds[phase] += seconds
+        self.calls[phase] += calls
+
+    def reset(self):
+        self.__init__()
+
+    def report(self):
+        """Returns a copy of the totals so far"""
+        return {
+            'elapsed': perf_counter() - self.started,
+            'ticks': self.ticks,
+            'generations': self.generations,
+            'seconds': dict(self.seconds),
+            'calls': dict(self.calls),
+        }
+
+
+def difference(report, previous):
+    """The totals of a report accumulated since an earlier report"""
+    return {
+        'elapsed': report['elapsed'] - previous['elapsed'],
+        'ticks': report['ticks'] - previous['ticks'],
+        'generations': report['generations'] - previous['generations'],
+        'seconds': {phase: report['seconds'][phase] - previous['seconds'][phase] for phase in PHASES},
+        'calls': {phase: report['calls'][phase] - previous['calls'][phase] for phase in PHASES},
+    }
+
+
+def format_report(report):
+    """Describe a report as lines of text, phase times are per call"""
+    elapsed = report['elapsed'] or 1
+    lines = ["%.1f ticks/s, %.2f generations/s" %
+             (report['ticks'] / elapsed, report['generations'] / elapsed)]
+    for phase in PHASES:
+        calls = report['calls'][phase]
+        if calls:
+            lines.append("%-16s %8.3f ms %6.1f%%" % (
+                phase, 1000 * report['seconds'][phase] / calls,
+                100 * report['seconds'][phase] / elapsed))
+    return lines
@@ -0,0 +1,178 @@
+# File Recording.py
+# Records the trajectory of a simulation to disk and reads it back for playback
+
+import json
+import os
+import numpy as np
+
+from populationSimulator.Config import SimulationConfig
+from populationSimulator.Engine import Snapshot
+
+# version 2 stores ids as 64 bit, the same as the population, and every setting of the run
+FORMAT_VERSION = 2
+
+# one record per creature per recorded time step
+CREATURE_RECORD = np.dtype([('id', '<i8'), ('x', '<f4'), ('y', '<f4'), ('energy', '<f4')])
+# one record per piece of food per recorded time step
+FOOD_RECORD = np.dtype([('id', '<i8'), ('x', '<f4'), ('y', '<f4')])
+# one record per time step, pointing at its creature and food records
+FRAME_RECORD = np.dtype([('generation', '<u4'), ('tick', '<u4'),
+                         ('creatureStart', '<u8'), ('creatureCount', '<u4'),
+                         ('foodStart', '<u8'), ('foodCount', '<u4')])
+# one record per creature at the start of every generation
+ATTRIBUTE_RECORD = np.dtype([('generation', '<u4'), ('id', '<i8'),
+                             ('size', '<f4'), ('sight', '<f4'), ('speed', '<f4')])
+
+HEADER_FILE = 'header.json'
+FRAME_FILE = 'frames.bin'
+CREATURE_FILE = 'creatures.bin'
+FOOD_FILE = 'food.bin'
+ATTRIBUTE_FILE = 'attributes.bin'
+
+
+class TrajectoryRecorder:
+    """
+    Appends every time step of a simulation to a directory of flat binary
+    files, each holding fixed width records. Records are buffered in
+    memory and written in large blocks
+    """
+
+    FLUSH_FRAMES = 256
+
+    def __init__(self, path, simulation, width, height):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        header = {
+            'version': FORMAT_VERSION,
+            'width': width,
+            'height': height,
+            'seed': simulation.seed,
+            # the same settings a checkpoint holds, as the run stood when recording started
+            'settings': simulation.config.replace(food_amount=simulation.foodAmount, width=width,
+                                                  height=height).to_dict(),
+        }
+        with open(os.path.join(path, HEADER_FILE), 'w') as header_file:
+            json.dump(header, header_file, indent=1)
+
+        self.files = {name: open(os.path.join(path, name), 'wb')
+                      for name in (FRAME_FILE, CREATURE_FILE, FOOD_FILE, ATTRIBUTE_FILE)}
+        self.pending = {name: [] for name in self.files}
+        self.creatureRecords = 0
+        self.foodRecords = 0
+
+    def record_generation(self, engine):
+        """Record the attributes of every creature alive at the start of a generation"""
+        population = engine.simulation.creatures
+        n = population.count
+        alive = population.alive[:n]
+        records = np.zeros(population.living, dtype=ATTRIBUTE_RECORD)
+        records['generation'] = engine.simulation.generation
+        records['id'] = population.ids[:n][alive]
+        records['size'] = population.size[:n][alive]
+        records['sight'] = population.sight[:n][alive]
+        records['speed'] = population.speed[:n][alive]
+        self.pending[ATTRIBUTE_FILE].append(records)
+
+    def record_frame(self, engine):
+        """Record the position of everything in the world at the current time step"""
+        population = engine.simulation.creatures
+        n = population.count
+        alive = population.alive[:n]
+        creatures = np.zeros(population.living, dtype=CREATURE_RECORD)
+        creatures['id'] = population.ids[:n][alive]
+        creatures['x'] = population.x[:n][alive]
+        creatures['y'] = population.y[:n][alive]
+        creatures['energy'] = population.energy[:n][alive]
+
+        food_list = engine.simulation.food.values()
+        food = np.zeros(len(food_list), dtype=FOOD_RECORD)
+        food['id'] = [piece.id for piece in food_list]
+        food['x'] = [piece.x for piece in food_list]
+        food['y'] = [piece.y for piece in food_list]
+
+        frame = np.zeros(1, dtype=FRAME_RECORD)
+        frame['generation'] = engine.simulation.generation
+        frame['tick'] = engine.ticks
+        frame['creatureStart'] = self.creatureRecords
+        frame['creatureCount'] = len(creatures)
+        frame['foodStart'] = self.foodRecords
+        frame['foodCount'] = len(food)
+        self.creatureRecords += len(creatures)
+        self.foodRecords += len(food)
+
+        self.pending[CREATURE_FILE].append(creatures)
+        self.pending[FOOD_FILE].append(food)
+        self.pending[FRAME_FILE].append(frame)
+        if len(self.pending[FRAME_FILE]) >= self.FLUSH_FRAMES:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far to disk"""
+        for name, records in self.pending.items():
+            if records:
+                self.files[name].write(np.concatenate(records).tobytes())
+                self.files[name].flush()
+            self.pending[name] = []
+
+    def close(self):
+        self.flush()
+        for recording_file in self.files.values():
+            recording_file.close()
+
+
+def map_records(path, dtype):
+    """Memory map a file of fixed width records, an empty file maps to an empty array"""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+class TrajectoryReader:
+    """
+    Reads a recording made by TrajectoryRecorder. The files are memory
+    mapped so only the time steps which are looked at are read from disk
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, HEADER_FILE)) as header_file:
+            self.header = json.load(header_file)
+        if self.header['version'] != FORMAT_VERSION:
+            raise ValueError("Unsupported recording version " +
+                             str(self.header['version']))
+        self.width = self.header['width']
+        self.height = self.header['height']
+        # the settings of the recorded run, such as which attributes could mutate
+        self.config = SimulationConfig(**self.header['settings'])
+        self.frames = map_records(os.path.join(path, FRAME_FILE), FRAME_RECORD)
+        self.creatures = map_records(
+            os.path.join(path, CREATURE_FILE), CREATURE_RECORD)
+        self.food = map_records(os.path.join(path, FOOD_FILE), FOOD_RECORD)
+        self.attributes = map_records(
+            os.path.join(path, ATTRIBUTE_FILE), ATTRIBUTE_RECORD)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def snapshot(self, index):
+        """Returns the state of the world at a recorded time step"""
+        frame = self.frames[index]
+        creature_start = int(frame['creatureStart'])
+        creatures = self.creatures[creature_start:
+                                   creature_start + int(frame['creatureCount'])]
+        food_start = int(frame['foodStart'])
+        food = self.food[food_start:food_start + int(frame['foodCount'])]
+        return Snapshot(
+            int(frame['generation']), int(frame['tick']),
+            list(zip(creatures['id'].tolist(),
+                     creatures['x'].tolist(), creatures['y'].tolist())),
+            list(zip(food['id'].tolist(), food['x'].tolist(), food['y'].tolist())))
+
+    def attribute_means(self):
+        """Returns the generations which were recorded and the average size, sight and
+           speed at the start of each of them, the same as Population.attribute_means()"""
+        records = self.attributes
+        generations, starts, counts = np.unique(records['generation'], return_index=True, return_counts=True)
+        means = {name: np.add.reduceat(records[name].astype(np.float64), starts) / counts
+                 for name in ('size', 'sight', 'speed')} if len(records) else {}
+        return generations.tolist(), [{name: float(column[index]) for name, column in means.items()}
+                                      for index in range(len(generations))]
@@ -0,0 +1,420 @@
+# File Sharding.py
+# Spreads the work of each time step over several processes
+
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+import os
+import numpy as np
+
+from populationSimulator.Config import SimulationConfig
+from populationSimulator.Engine import Engine, PYTHON_BACKEND, prepare_process
+from populationSimulator.Food import Food
+from populationSimulator.Population import Population, FOOD_TARGET
+from populationSimulator.Profiler import Profiler
+from populationSimulator.Simulation import Simulation
+
+# arrays shared alongside the population, which shards write their decisions into
+DECISION_COLUMNS = (
+    ('targetX', np.float64),
+    ('targetY', np.float64),
+    ('direction', np.float64),
+    ('chasing', np.bool_),
+    # slots of the creatures being visited this step
+    ('visiting', np.int64),
+)
+CREATURE_COLUMNS = Population.COLUMNS + DECISION_COLUMNS
+FOOD_COLUMNS = (
+    ('id', np.int64),
+    ('x', np.float64),
+    ('y', np.float64),
+)
+
+
+class SharedColumns:
+    """
+    Named arrays laid out one after another in a single block of shared
+    memory. The process which creates a block owns it and unlinks it,
+    other processes attach to it by name
+    """
+
+    ALIGNMENT = 8
+
+    def __init__(self, columns, capacity, name=None):
+        self.capacity = capacity
+        offsets = []
+        size = 0
+        for _, dtype in columns:
+            offsets.append(size)
+            size += -(-np.dtype(dtype).itemsize * capacity // self.ALIGNMENT) * self.ALIGNMENT
+        self.owner = name is None
+        self.memory = SharedMemory(name=name, create=self.owner, size=max(size, 1))
+        self.name = self.memory.name
+        self.arrays = {column: np.ndarray(capacity, dtype, buffer=self.memory.buf, offset=offset)
+                       for (column, dtype), offset in zip(columns, offsets)}
+
+    def __getitem__(self, column):
+        return self.arrays[column]
+
+    def close(self):
+        # every view of the buffer has to go before it can be closed
+        self.arrays = {}
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class Shard:
+    """
+    The worker process side of a ShardedEngine. Holds a view of the world
+    in shared memory and takes one strip of it through each time step,
+    using the same Engine as a single process: it decides for the creatures
+    of its strip, moves them, and works out which of them can reach their
+    target. Creatures are added to the grid of the shard only if they are
+    in its strip or close enough to it to be seen from inside, and the food
+    is kept in step with the parent by being told what was eaten
+    """
+
+    def __init__(self, settings, width, height, profile, backend):
+        self.engine = Engine(Simulation(SimulationConfig(**settings)), width, height,
+                             profiler=Profiler() if profile else None, backend=backend)
+        self.creatures = None
+        self.creatureVersion = None
+        self.food = None
+        self.foodVersion = None
+        # slots of the creatures of this shard's strip in the current step
+        self.slots = np.zeros(0, dtype=np.int64)
+
+    def update_food(self, task):
+        engine = self.engine
+        simulation = engine.simulation
+        if task['foodVersion'] != self.foodVersion:
+            if self.food is None or self.food.name != task['foodBlock']:
+                if self.food:
+                    self.food.close()
+                self.food = SharedColumns(FOOD_COLUMNS, task['foodCapacity'], task['foodBlock'])
+            self.foodVersion = task['foodVersion']
+            simulation.clear_food()
+            count = task['foodCount']
+            for food_id, x, y in zip(self.food['id'][:count].tolist(), self.food['x'][:count].tolist(),
+                                     self.food['y'][:count].tolist()):
+                food = Food(x, y)
+                food.id = food_id
+                simulation.insert_food(food)
+        for food_id in task['eatenFood']:
+            if food_id in simulation.food:
+                engine.remove_food(food_id)
+
+    def attach_creatures(self, task):
+        """Make the population a view of the creatures in shared memory, only working out
+           which are living from scratch when their slots may have changed"""
+        population = self.engine.simulation.creatures
+        if self.creatures and self.creatures.name == task['creatureBlock']:
+            if task['creatureVersion'] == self.creatureVersion:
+                population.forget(task['killedCreatures'])
+            else:
+                population.attach(self.creatures.arrays, task['count'])
+        else:
+            previous = self.creatures
+            self.creatures = SharedColumns(CREATURE_COLUMNS, task['creatureCapacity'], task['creatureBlock'])
+            # the population lets go of the previous block before it is closed
+            population.attach(self.creatures.arrays, task['count'])
+            if previous:
+                previous.close()
+        self.creatureVersion = task['creatureVersion']
+
+    def decide(self, task):
+        """Decide for the creatures of a strip, returns what Engine.decide does"""
+        self.update_food(task)
+        self.attach_creatures(task)
+        self.slots = np.zeros(0, dtype=np.int64)
+        if task['strip'] is None:
+            return False, 0.0, 0.0
+
+        simulation = self.engine.simulation
+        population = simulation.creatures
+        n = task['count']
+        left, right = task['strip']
+        visiting = self.creatures['visiting'][:task['visits']]
+        x = population.x[:n]
+        self.slots = visiting[(x[visiting] >= left) & (x[visiting] < right)]
+        if len(self.slots) == 0:
+            return False, 0.0, 0.0
+
+        # anything a creature of the strip could look for is within the halo around it
+        halo = max(population.sightRadius[self.slots].max(), population.fleeRadius[self.slots].max())
+        nearby = np.flatnonzero(population.alive[:n] & (x >= left - halo) & (x <= right + halo))
+        target_x = self.creatures['targetX']
+        target_y = self.creatures['targetY']
+        direction = self.creatures['direction']
+        chasing = self.creatures['chasing']
+        engine = self.engine
+        # a compiled kernel is handed the nearby creatures instead of a grid of them
+        if engine.kernel:
+            return engine.kernel.decide(engine, self.slots, task['scanForThreats'], target_x, target_y,
+                                        direction, chasing, nearby)
+        grid = simulation.creatureGrid
+        grid.clear()
+        grid.insert_many(population.ids[nearby].tolist(), x[nearby], population.y[nearby])
+        return engine.decide(self.slots, task['scanForThreats'], target_x, target_y, direction, chasing)
+
+    def move(self, task):
+        """Move the creatures of the strip, once every shard has decided"""
+        if len(self.slots) == 0:
+            return
+        direction = self.creatures['direction']
+        moving = self.slots[direction[self.slots] != 0]
+        self.engine.simulation.creatures.move_slots(
+            moving, self.creatures['targetX'][moving], self.creatures['targetY'][moving],
+            direction[moving], self.engine.width, self.engine.height)
+
+    def reaching(self, task):
+        """Returns the slots of the creatures of the strip which can reach their target, once
+           every shard has moved"""
+        if len(self.slots) == 0:
+            return self.slots
+        engine = self.engine
+        chasing = np.zeros(task['count'], dtype=bool)
+        chasing[self.slots] = self.creatures['chasing'][self.slots]
+        return engine.reaching(chasing, engine.reach())
+
+    def close(self):
+        # the population lets go of the shared creatures before they are closed
+        self.engine.simulation.clear()
+        for block in (self.creatures, self.food):
+            if block:
+                block.close()
+
+
+# what a shard can be asked to do with each part of a time step
+SHARD_PHASES = ('decide', 'move', 'reaching')
+
+
+def run_shard(connection, settings, width, height, profile, backend):
+    """Entry point of a shard process, carries out whatever phase of a step it is sent until sent None.
+       The settings of the config are needed for the creature constants"""
+    shard = Shard(settings, width, height, profile, prepare_process(backend))
+    try:
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            phase, task = message
+            connection.send(getattr(shard, SHARD_PHASES[phase])(task))
+    finally:
+        shard.close()
+        connection.close()
+
+
+class ShardedEngine(Engine):
+    """
+    An engine which splits each time step between several worker
+    processes. The creatures are kept in shared memory, and those being
+    visited are split into strips across the world holding equal numbers
+    of them. Each strip is handed to a shard, which also sees a halo of
+    creatures just outside its strip. Every shard decides for its own
+    creatures, then once all of them have decided moves them, and once
+    all of them have moved finds which of them can reach their target.
+    Only settling who ate what is left to this process, going through
+    those creatures in order, so creatures crossing from one strip to
+    another need no special handling and the outcome of a seed is exactly
+    the same as with a single process. The grid of creatures in this
+    process is only brought up to date when something needs it
+    """
+
+    # below this many creatures to visit handing a step to the shards costs more than it saves
+    MIN_SHARDED_VISITS = 1000
+    # fewest creatures worth giving a shard of their own
+    MIN_SHARD_SIZE = 250
+
+    # phases of a step, as numbered for the shards
+    DECIDE, MOVE, REACHING = range(len(SHARD_PHASES))
+
+    def __init__(self, simulation, width, height, recorder=None, events=None, profiler=None,
+                 statistics=None, workers=None, backend=PYTHON_BACKEND):
+        super().__init__(simulation, width, height, recorder, events, profiler, statistics, backend)
+        context = get_context('spawn')
+        self.connections = []
+        self.processes = []
+        for _ in range(workers or os.cpu_count()):
+            connection, shard_connection = context.Pipe()
+            process = context.Process(target=run_shard, daemon=True,
+                                      args=(shard_connection, simulation.config.to_dict(),
+                                            width, height, profiler is not None, backend))
+            process.start()
+            shard_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        self.creatureBlock = None
+        self.foodBlock = None
+        # the food the shards were last sent, and what of it was eaten since
+        self.sharedFood = None
+        self.sharedFoodCount = 0
+        self.foodVersion = 0
+        self.eatenFood = []
+        # changed whenever creatures may have moved to other slots, and who was killed since
+        self.creatureVersion = 0
+        self.killedCreatures = []
+        # whether the shards are taking the current step
+        self.sharing = False
+        # whether creatures moved by the shards have yet to be moved in the grid
+        self.gridStale = False
+
+    def share_creatures(self):
+        """Move the population into shared memory, unless it is already there"""
+        population = self.simulation.creatures
+        block = self.creatureBlock
+        if block is not None and population.ids is block['ids']:
+            return block
+        n = population.count
+        self.creatureBlock = SharedColumns(CREATURE_COLUMNS, population.capacity)
+        for name, _ in Population.COLUMNS:
+            self.creatureBlock[name][:n] = getattr(population, name)[:n]
+        population.attach(self.creatureBlock.arrays, n)
+        self.creatureVersion += 1
+        # the population grew or was replaced, so nothing uses the previous block any more
+        if block:
+            block.close()
+        return self.creatureBlock
+
+    def strips(self, visiting):
+        """Returns the (left, right) bounds along x of every strip, each holding about
+           the same number of the visited creatures"""
+        visits = len(visiting)
+        shards = max(1, min(len(self.connections), visits // self.MIN_SHARD_SIZE))
+        ranks = np.arange(1, shards) * visits // shards
+        cuts = np.partition(self.simulation.creatures.x[visiting], ranks)[ranks].tolist()
+        bounds = [-np.inf] + cuts + [np.inf]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def publish_food(self):
+        """Returns the food part of a task, copying all the food into shared memory when the
+           shards cannot be brought up to date by just telling them what was eaten"""
+        food_by_id = self.simulation.food
+        eaten = self.eatenFood
+        self.eatenFood = []
+        if food_by_id is not self.sharedFood or len(food_by_id) != self.sharedFoodCount - len(eaten):
+            count = len(food_by_id)
+            if self.foodBlock is None or self.foodBlock.capacity < count:
+                if self.foodBlock:
+                    self.foodBlock.close()
+                self.foodBlock = SharedColumns(FOOD_COLUMNS, max(count, 1))
+            food = list(food_by_id.values())
+            self.foodBlock['id'][:count] = [piece.id for piece in food]
+            self.foodBlock['x'][:count] = [piece.x for piece in food]
+            self.foodBlock['y'][:count] = [piece.y for piece in food]
+            self.sharedFood = food_by_id
+            self.foodVersion += 1
+            eaten = []
+        self.sharedFoodCount = len(food_by_id)
+        return {'foodBlock': self.foodBlock.name, 'foodCapacity': self.foodBlock.capacity,
+                'foodCount': self.sharedFoodCount, 'foodVersion': self.foodVersion,
+                'eatenFood': eaten}
+
+    def run_phase(self, phase, tasks):
+        """Send every shard its task for a phase of the step, returns what each of them sent back"""
+        for connection, task in zip(self.connections, tasks):
+            connection.send((phase, task))
+        return [connection.recv() for connection in self.connections]
+
+    def sync_grid(self):
+        """Bring the grid of creatures up to date with what the shards moved"""
+        if self.gridStale:
+            population = self.simulation.creatures
+            self.simulation.update_creature_cells(np.flatnonzero(population.alive[:population.count]))
+            self.gridStale = False
+
+    def decide(self, visiting, scan_for_threats, target_x, target_y, direction, chasing):
+        """Decide in the shards when there are enough creatures to visit, otherwise in this process"""
+        self.sharing = len(visiting) >= self.MIN_SHARDED_VISITS and bool(self.connections)
+        if not self.sharing:
+            self.sync_grid()
+            return super().decide(visiting, scan_for_threats, target_x, target_y, direction, chasing)
+
+        population = self.simulation.creatures
+        n = population.count
+        block = self.share_creatures()
+        for name in ('targetX', 'targetY', 'direction', 'chasing'):
+            block[name][:n] = 0
+        block['visiting'][:len(visiting)] = visiting
+        strips = self.strips(visiting)
+        food = self.publish_food()
+        # every shard is sent a task, even without a strip, so none of them miss what was eaten
+        tasks = []
+        for i in range(len(self.connections)):
+            task = {'creatureBlock': block.name, 'creatureCapacity': block.capacity, 'count': n,
+                    'creatureVersion': self.creatureVersion, 'killedCreatures': self.killedCreatures,
+                    'visits': len(visiting), 'scanForThreats': scan_for_threats,
+                    'strip': strips[i] if i < len(strips) else None}
+            task.update(food)
+            tasks.append(task)
+        self.killedCreatures = []
+
+        creature_moved = False
+        threat_seconds = 0.0
+        food_seconds = 0.0
+        for moved, threats, searches in self.run_phase(self.DECIDE, tasks):
+            creature_moved = creature_moved or moved
+            # the shards run at the same time, so the slowest of them is what the step waits on
+            threat_seconds = max(threat_seconds, threats)
+            food_seconds = max(food_seconds, searches)
+
+        target_x[:] = block['targetX'][:n]
+        target_y[:] = block['targetY'][:n]
+        direction[:] = block['direction'][:n]
+        chasing[:] = block['chasing'][:n]
+        return creature_moved, threat_seconds, food_seconds
+
+    def move(self, target_x, target_y, direction):
+        """Have each shard move the creatures it decided for"""
+        if not self.sharing:
+            return super().move(target_x, target_y, direction)
+        self.run_phase(self.MOVE, [None] * len(self.connections))
+        self.gridStale = True
+
+    def reaching(self, chasing, reach):
+        """Gather the creatures which can reach their target from every shard"""
+        if not self.sharing:
+            return super().reaching(chasing, reach)
+        task = {'count': self.simulation.creatures.count}
+        return np.sort(np.concatenate(self.run_phase(self.REACHING, [task] * len(self.connections))))
+
+    def feed(self, slot, slots):
+        """Eat as usual while remembering which food and creatures went, to pass on to the shards"""
+        population = self.simulation.creatures
+        if population.targetKind[slot] == FOOD_TARGET:
+            self.eatenFood.append(int(population.targetId[slot]))
+        else:
+            self.killedCreatures.append(int(population.targetId[slot]))
+        super().feed(slot, slots)
+
+    def reset_creatures(self):
+        # every creature left is put back in the grid where it starts the next generation
+        super().reset_creatures()
+        self.gridStale = False
+        self.creatureVersion += 1
+        self.killedCreatures = []
+
+    def snapshot(self, bounds=None):
+        if bounds is not None:
+            self.sync_grid()
+        return super().snapshot(bounds)
+
+    def close(self):
+        """Stop the shard processes and free the shared memory, giving the population its own copy"""
+        for connection in self.connections:
+            connection.send(None)
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+        self.processes = []
+        population = self.simulation.creatures
+        if self.creatureBlock and population.ids is self.creatureBlock['ids']:
+            population.attach({name: getattr(population, name).copy() for name, _ in Population.COLUMNS},
+                              population.count)
+        for block in (self.creatureBlock, self.foodBlock):
+            if block:
+                block.close()
+        self.creatureBlock = None
+        self.foodBlock = None
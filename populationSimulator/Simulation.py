@@ -1,36 +1,133 @@
 # File Simulation.py
 # Holds all the information about a particular instance of a simulation
-from populationSimulator.Util import FUNCTION_STRINGS
+from random import Random, randrange
+import numpy as np
+
+from populationSimulator.Config import SimulationConfig
+from populationSimulator.Food import Food
+from populationSimulator.Population import Population
+from populationSimulator.SpatialGrid import SpatialGrid
 
 
 class Simulation:
     """
     Holds information about a current instance of a simulation this includes 
     actors and instance variables.
-    In theory an entire simulation can be recreated from this instance which 
-    makes it useful for data analyzing.
+    An entire simulation can be recreated from this instance which makes
+    it useful for data analyzing. All randomness is drawn from the
+    simulation's own generator, so two simulations with the same seed
+    and settings play out exactly the same way.
     """
 
-    def __init__(self, main_window):
-        self.enableSizeMutation = main_window.enable_size_mutation.isChecked()
-        self.enableSightMutation = main_window.enable_sight_mutation.isChecked()
-        self.enableSpeedMutation = main_window.enable_speed_mutation.isChecked()
-        self.speedCostExponent = FUNCTION_STRINGS.index(
-            main_window.speed_cost_function_comboBox.currentText())
-        self.sightCostExponent = FUNCTION_STRINGS.index(
-            main_window.sight_cost_function_comboBox.currentText())
-        self.sizeCostExponent = FUNCTION_STRINGS.index(
-            main_window.size_cost_function_comboBox.currentText())
-
-        self.food = []
-        self.creatures = []
+    # seeds are drawn from this range when none is given
+    SEED_RANGE = 2 ** 32
+
+    def __init__(self, config=None, **settings):
+        """Create a simulation as described by a SimulationConfig, changing any
+           settings given by their config key, so Simulation(food_amount=100)
+           is the default config with more food"""
+        config = config or SimulationConfig()
+        if settings:
+            config = config.replace(**settings)
+        if config.seed is None:
+            config = config.replace(seed=randrange(self.SEED_RANGE))
+        self.config = config
+        self.enableSizeMutation = config.enableSizeMutation
+        self.enableSightMutation = config.enableSightMutation
+        self.enableSpeedMutation = config.enableSpeedMutation
+        self.speedCostExponent = config.speedCostExponent
+        self.sightCostExponent = config.sightCostExponent
+        self.sizeCostExponent = config.sizeCostExponent
+        # can be changed while the simulation runs, from the next generation on
+        self.foodAmount = config.foodAmount
+        self.startingPopulation = config.startingPopulation
+        self.seed = config.seed
+        self.random = Random(self.seed)
+
+        self.food = {}  # id -> Food
+        self.creatures = Population(config)
+        # spatial indexes of the food and creatures, keyed by id
+        self.foodGrid = SpatialGrid()
+        self.creatureGrid = SpatialGrid()
         self.generation = 0
+        self.nextEntityId = 0
+
+    def new_entity_id(self):
+        """Hand out an id which is unique for the lifetime of this simulation"""
+        entity_id = self.nextEntityId
+        self.nextEntityId += 1
+        return entity_id
+
+    def batch_random(self):
+        """Returns a NumPy generator seeded from the simulation's generator,
+           for drawing the numbers of a whole generation turnover at once"""
+        return np.random.default_rng(self.random.getrandbits(64))
+
+    def add_foods(self, xs, ys):
+        """Add a piece of food at each of the given positions"""
+        food_ids = range(self.nextEntityId, self.nextEntityId + len(xs))
+        self.nextEntityId += len(xs)
+        for food_id, x, y in zip(food_ids, xs, ys):
+            food = Food(x, y)
+            food.id = food_id
+            self.food[food_id] = food
+        self.foodGrid.insert_many(food_ids, xs, ys)
+
+    def insert_food(self, food):
+        """Add food which already has an id, such as food restored from a checkpoint"""
+        self.food[food.id] = food
+        self.foodGrid.insert(food.id, food.x, food.y)
+
+    def remove_food(self, food_id):
+        del self.food[food_id]
+        self.foodGrid.remove(food_id)
+
+    def clear_food(self):
+        self.food = {}
+        self.foodGrid.clear()
+
+    def add_creatures(self, x, y, size, sight, speed):
+        """Add a creature for every entry of the given arrays, returns their slots"""
+        creature_ids = np.arange(self.nextEntityId, self.nextEntityId + len(x))
+        self.nextEntityId += len(x)
+        self.creatureGrid.insert_many(creature_ids.tolist(), x, y)
+        return self.creatures.add_many(creature_ids, x, y, size, sight, speed)
+
+    def update_creature_cells(self, slots):
+        """Let the spatial index know the given creatures have moved"""
+        population = self.creatures
+        move = self.creatureGrid.move
+        for creature_id, x, y in zip(population.ids[slots].tolist(), population.x[slots].tolist(),
+                                     population.y[slots].tolist()):
+            move(creature_id, x, y)
+
+    def kill_creature(self, slot):
+        self.creatureGrid.remove(int(self.creatures.ids[slot]))
+        self.creatures.kill(slot)
+
+    def keep_creatures(self, mask):
+        """Remove every creature whose entry in mask is False"""
+        population = self.creatures
+        n = population.count
+        for creature_id in population.ids[:n][~mask & population.alive[:n]].tolist():
+            self.creatureGrid.remove(creature_id)
+        population.keep(mask)
 
-    def add_food(self, food):
-        self.food.append(food)
+    def restore_creatures(self, columns, count):
+        """Replace the population with the given per creature arrays, such as
+           those saved in a checkpoint, and index the living creatures"""
+        self.creatures = Population(self.config)
+        self.creatures.restore(columns, count)
+        self.creatureGrid.clear()
+        population = self.creatures
+        for slot in population.slotOf.values():
+            self.creatureGrid.insert(int(population.ids[slot]), population.x[slot], population.y[slot])
 
-    def add_creature(self, creature):
-        self.creatures.append(creature)
+    def clear(self):
+        """Remove every creature and piece of food from the simulation"""
+        self.clear_food()
+        self.creatures = Population(self.config)
+        self.creatureGrid.clear()
 
     def population_size(self):
         return len(self.creatures)
@@ -1,123 +1,164 @@
 # File SimulationView.py
 # Handles the rendering of a simulation
 
-from PyQt5.QtWidgets import QGraphicsScene, QMessageBox, QGraphicsPixmapItem
-from PyQt5.QtCore import QTimer
-from random import randint
+from PyQt5.QtWidgets import QGraphicsScene, QGraphicsView, QMessageBox, QGraphicsPixmapItem, QSlider, \
+    QFileDialog, QLabel
+from PyQt5.QtCore import QTimer, Qt, QObject, QEvent
+from bisect import bisect_right
+from math import sqrt
+from time import perf_counter
 import logging
 
-from populationSimulator.Creature import Creature
+from populationSimulator.Assets import pixmap
+from populationSimulator.Checkpoint import restore
+from populationSimulator.Engine import Engine
+from populationSimulator.EventLog import EventLog, LoggingSink
 from populationSimulator.Food import Food
-from populationSimulator.Graph import Graph
+from populationSimulator.Profiler import Profiler, RENDER, GRAPH_UPDATE, difference, format_report
+from populationSimulator.Recording import TrajectoryReader
 from populationSimulator.Simulation import Simulation
-from populationSimulator.Util import object_distance, close_enough
+from populationSimulator.SimulationWorker import SimulationWorker
+from populationSimulator.Util import steps_per_frame, world_scale
 
 
 class SimulationLoop:
     """
-    A helper class for SimulationView which is responsible for
-    rendering the main simulation loop of the actors and managing
-    generation timing
+    A helper class for SimulationView which runs the engine on a
+    background SimulationWorker and, on a timer, draws whatever the
+    worker most recently published. Pausing and cancelling are passed
+    on to the worker as messages, so the GUI never waits on the engine
     """
 
     FRAMES_PER_SECOND = 30
 
-    frames = 0
-
-    def __init__(self, simulation_view):
+    def __init__(self, simulation_view, engine, steps=1, viewport=None):
         self.simulationView = simulation_view
+        self.worker = SimulationWorker(engine, self.steps_per_second(steps), viewport)
+        self.renderedVersion = -1
+        self.workerStarted = False
         self.timer = QTimer()
         self.timer.timeout.connect(self.next_time_step)
-        self.timer.setInterval(1000 / self.FRAMES_PER_SECOND)
+        self.timer.setInterval(1000 // self.FRAMES_PER_SECOND)
 
-    def next_time_step(self):
-        self.next_frame()
-        self.update_lcds()
-
-    def find_food(self, creature):
-        """See if the given creature can find food"""
-        if creature.closest_food in self.simulationView.graphicsScene.items():
-            return creature.closest_food
-
-        return creature.find_closest_food(
-            self.simulationView.simulation.food,
-            [x for x in self.simulationView.simulation.creatures if x not in [creature]])
-
-    def remove_item_from_sim(self, item):
-        self.simulationView.graphicsScene.removeItem(item)
-        if isinstance(item, Food):
-            self.simulationView.simulation.food.remove(item)
-        else:
-            self.simulationView.simulation.creatures.remove(
-                item)
+    def steps_per_second(self, steps_per_frame):
+        """Engine steps per rendered frame turned into a rate for the worker, None being unbounded"""
+        if steps_per_frame is None:
+            return None
+        return steps_per_frame * self.FRAMES_PER_SECOND
 
-    def next_frame(self):
-        """Render one time step of the simulation"""
-        self.frames += 1
-        creature_moved = False
-        for creature in self.simulationView.simulation.creatures:
+    def set_steps_per_frame(self, steps):
+        self.worker.set_steps_per_second(self.steps_per_second(steps))
 
-            # creature is out of energy, it cannot move
-            if creature.is_out_of_energy():
-                continue
+    def set_food_amount(self, food_amount):
+        self.worker.set_food_amount(food_amount)
 
-            # run away from larger creatures if they are too close
-            if self.frames % self.FRAMES_PER_SECOND / 4 == 0:
-                creature.hostile = creature.find_hostile(
-                    self.simulationView.simulation.creatures)
-
-            hostile = creature.hostile
-            if hostile and hostile.isActive():
-                creature.move_away_from_object(hostile, self.simulationView)
-                creature.hostile = hostile
-                creature.closest_food = None
-                logging.info(str(creature) +
-                             " running away from creature " + str(hostile))
-                continue
+    def set_viewport(self, viewport):
+        self.worker.set_viewport(viewport)
 
-            # if the creature is full and safe, continue
-            if creature.is_full():
-                continue
+    def save_checkpoint(self, path):
+        self.worker.save_checkpoint(path)
 
-            closest_food = self.find_food(creature)
-            creature.closest_food = closest_food
+    def next_time_step(self):
+        """Draw the newest snapshot and graph any finished generations"""
+        # checked first so everything published before the worker finished is drawn
+        finished = self.worker.finished
+
+        snapshot, version = self.worker.latest()
+        if version != self.renderedVersion:
+            self.renderedVersion = version
+            self.simulationView.render(snapshot)
+            self.update_lcds(snapshot)
+
+        profiler = self.simulationView.profiler
+        for averages in self.worker.finished_generations():
+            started = perf_counter()
+            self.simulationView.graphView.update_graph(averages)
+            if profiler:
+                profiler.add(GRAPH_UPDATE, perf_counter() - started)
+
+        if finished:
+            self.timer.stop()
+            self.simulationView.simulation_finished(self.worker.extinct)
+
+    def update_lcds(self, snapshot):
+        """Update the LCD displays in the scene"""
+        self.simulationView.mainWindow.generation_number_display.display(
+            snapshot.generation)
+        self.simulationView.mainWindow.creature_number_display.display(
+            snapshot.population)
 
-            if closest_food and object_distance(creature, closest_food) < creature.seeing_distance():
+    def start(self):
+        if self.workerStarted:
+            self.worker.resume()
+        else:
+            self.worker.start()
+            self.workerStarted = True
+        self.timer.start()
 
-                creature.move_towards_object(
-                    closest_food, self.simulationView)
+    def pause(self):
+        self.worker.pause()
+        self.timer.stop()
 
-                # if creature could reach food in next time step
-                if close_enough(creature, closest_food, creature.movement_speed() + self.simulationView.BUFFER):
-                    creature.eat()
-                    creature.closest_food = None
-                    self.remove_item_from_sim(closest_food)
-                    logging.info("I have been eaten " + str(closest_food))
+    def cancel(self):
+        """Stop the worker for good, waiting for it to finish its current step"""
+        self.timer.stop()
+        self.worker.cancel()
 
-                creature_moved = True
 
-            elif not close_enough(creature, self.simulationView.CENTER_OF_SIM, creature.movement_speed()):
-                # creature could not see food, move towards center
-                creature.move_towards_object(
-                    self.simulationView.CENTER_OF_SIM, self.simulationView)
-                creature_moved = True
+class PlaybackLoop:
+    """
+    A helper class for SimulationView which plays back a recorded
+    simulation on a timer, without running the engine
+    """
 
-        # no movement occurred, end of generation
-        if not creature_moved:
-            self.pause()
-            self.next_generation()
+    FRAMES_PER_SECOND = 30
 
-    def update_lcds(self):
-        """Update the LCD displays in the scene"""
+    def __init__(self, simulation_view, reader):
+        self.simulationView = simulation_view
+        self.reader = reader
+        self.frame = 0
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.next_time_step)
+        self.timer.setInterval(1000 // self.FRAMES_PER_SECOND)
+        self.generations, self.averages = reader.attribute_means()
+        # how many of the recorded generations the graph has got to, the first being where it starts
+        self.graphed = min(1, len(self.generations))
+
+    def next_time_step(self):
+        if self.frame >= len(self.reader) - 1:
+            self.pause()
+            return
+        self.seek(self.frame + 1)
+
+    def seek(self, frame):
+        """Show the recorded time step with the given index"""
+        self.frame = frame
+        snapshot = self.reader.snapshot(frame)
+        self.simulationView.render(
+            snapshot.cropped(self.simulationView.visible_bounds()))
+        self.simulationView.show_playback_position(frame)
         self.simulationView.mainWindow.generation_number_display.display(
-            self.simulationView.simulation.generation)
+            snapshot.generation)
         self.simulationView.mainWindow.creature_number_display.display(
-            self.simulationView.simulation.population_size())
-
-    def next_generation(self):
-        logging.info("This generation had ended ")
-        self.pause()
-        self.simulationView.go_to_next_generation()
+            snapshot.population)
+        self.update_graph(snapshot.generation)
+
+    def update_graph(self, generation):
+        """Graph the averages of every recorded generation up to the given one, the same
+           as when simulating, starting the graph again if playback went back"""
+        graph = self.simulationView.graphView
+        reached = bisect_right(self.generations, generation)
+        if reached < self.graphed:
+            graph.reset_graph()
+            graph.create_axis()
+            self.graphed = 1
+        for averages in self.averages[self.graphed:reached]:
+            graph.update_graph(averages)
+        self.graphed = max(self.graphed, reached)
+
+    def set_viewport(self, viewport):
+        """Draw the current time step again for the new viewport"""
+        self.seek(self.frame)
 
     def start(self):
         self.timer.start()
@@ -125,16 +166,48 @@ class SimulationLoop:
     def pause(self):
         self.timer.stop()
 
+    def cancel(self):
+        self.pause()
+
+
+class ViewportControls(QObject):
+    """
+    Zooms the simulation window in and out with the mouse wheel,
+    panning is done by dragging the scene
+    """
+
+    ZOOM_STEP = 1.25
+
+    def __init__(self, simulation_view):
+        super(ViewportControls, self).__init__()
+        self.simulationView = simulation_view
+
+    def eventFilter(self, watched, event):
+        if event.type() != QEvent.Wheel:
+            return False
+        if event.angleDelta().y() > 0:
+            self.simulationView.zoom(self.ZOOM_STEP)
+        elif event.angleDelta().y() < 0:
+            self.simulationView.zoom(1 / self.ZOOM_STEP)
+        return True
+
 
 class SimulationView:
     """
     Main driver class responsible for handling UI interactions
     and setting up/tearing down and reseting simulations.
+    The simulation itself is run by an Engine, this class only
+    draws snapshots of it to the screen. The world may be larger than
+    the window, in which case only what is in view is drawn
     """
 
-    CENTER_OF_SIM = None
-    BUFFER = 20  # ensure we don't drop items too close to the extremes of the scene
-    FOOD_BUFFER = 25  # don't let food spawn too close to the edges
+    BUFFER = 20  # keep the scene slightly smaller than the window
+    # also draw what is just out of view so sprites do not pop in at the edges
+    CULL_MARGIN = 50
+    # spare sprites kept hidden in the scene for reuse, per kind of entity
+    SPRITE_POOL_LIMIT = 1000
+    MAX_ZOOM = 8
+    OVERLAY_INTERVAL = 1000  # milliseconds between updates of the performance overlay
 
     def __init__(self, main_window):
         self.mainWindow = main_window
@@ -143,10 +216,18 @@ class SimulationView:
 
         self.connect_inputs_to_functions(self.mainWindow)
 
+        # matplotlib is slow to import, so it is left until there is a graph to show
+        from populationSimulator.Graph import Graph
         self.graphView = Graph(self.mainWindow.graph_container)
 
         self.graphicsScene = None
         self.simulation = None
+        self.engine = None
+        self.creatureSprites = {}
+        self.foodSprites = {}
+        # hidden sprites kept around to be reused rather than recreated
+        self.creatureSpritePool = []
+        self.foodSpritePool = []
         self.isSimulating = False
         self.simulationStarted = False
         self.paused = False
@@ -154,6 +235,38 @@ class SimulationView:
         self.beginSimulationButton = None
         self.cancelSimulationButton = None
         self.toggleSimulationButton = None
+        # area of the world as a multiple of the window, food and creatures scale with it
+        self.worldScale = 1
+        # only set while the performance overlay is shown
+        self.profiler = None
+        self.previousReport = None
+
+        # lets the user scrub through a recording, only shown during playback
+        self.playbackSlider = QSlider(Qt.Horizontal, self.simWindow)
+        self.playbackSlider.setGeometry(
+            self.BUFFER, self.simWindow.height() - 2 * self.BUFFER,
+            self.simWindow.width() - 2 * self.BUFFER, self.BUFFER)
+        self.playbackSlider.valueChanged.connect(self.scrub_playback)
+        self.playbackSlider.hide()
+
+        # shows where the time goes, toggled from the View menu
+        self.performanceOverlay = QLabel(self.simWindow)
+        self.performanceOverlay.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 160); color: white; font-family: monospace; padding: 4px;")
+        self.performanceOverlay.move(self.BUFFER, self.BUFFER)
+        self.performanceOverlay.hide()
+        self.overlayTimer = QTimer()
+        self.overlayTimer.timeout.connect(self.update_overlay)
+        self.overlayTimer.setInterval(self.OVERLAY_INTERVAL)
+
+        self.simWindow.setDragMode(QGraphicsView.ScrollHandDrag)
+        # most sprites move every frame, redrawing everything beats working out what changed
+        self.simWindow.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        self.simWindow.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.viewportControls = ViewportControls(self)
+        self.simWindow.viewport().installEventFilter(self.viewportControls)
+        self.simWindow.horizontalScrollBar().valueChanged.connect(self.viewport_changed)
+        self.simWindow.verticalScrollBar().valueChanged.connect(self.viewport_changed)
 
     def connect_inputs_to_functions(self, main_window):
         """Connect all user inputs to functions"""
@@ -166,58 +279,140 @@ class SimulationView:
         self.toggleSimulationButton = main_window.toggle_simulation_button
         self.toggleSimulationButton.clicked.connect(self.toggle_simulation)
 
-    def create_graphics_scene(self):
+        main_window.simulation_speed_comboBox.currentTextChanged.connect(
+            self.change_speed)
+        main_window.food_slider.valueChanged.connect(self.change_food_amount)
+
+        file_menu = main_window.menuBar().addMenu("File")
+        open_recording = file_menu.addAction("Open Recording...")
+        open_recording.triggered.connect(self.choose_recording)
+        save_checkpoint = file_menu.addAction("Save Checkpoint...")
+        save_checkpoint.triggered.connect(self.choose_checkpoint_destination)
+        resume_checkpoint = file_menu.addAction("Resume Checkpoint...")
+        resume_checkpoint.triggered.connect(self.choose_checkpoint)
+
+        show_overlay = main_window.menuBar().addMenu(
+            "View").addAction("Performance Overlay")
+        show_overlay.setCheckable(True)
+        show_overlay.toggled.connect(self.toggle_overlay)
+
+    def create_graphics_scene(self, width=None, height=None):
         """Create new graphics scene inside the graphics view and set size"""
+        width = width or self.simWindow.width()
+        height = height or self.simWindow.height()
         self.graphicsScene = QGraphicsScene()
+        # sprites move every frame, keeping an index of them up to date costs more than it saves
+        self.graphicsScene.setItemIndexMethod(QGraphicsScene.NoIndex)
+        self.simWindow.resetTransform()
         self.graphicsScene.setSceneRect(self.simWindow.x(), self.simWindow.y(
-        ), self.simWindow.width() - self.BUFFER, self.simWindow.height() - self.BUFFER)
+        ), width - self.BUFFER, height - self.BUFFER)
         self.simWindow.setScene(self.graphicsScene)
-
-        # add an object to the center of the screen for path finding purposes
-        self.CENTER_OF_SIM = QGraphicsPixmapItem()
-        self.CENTER_OF_SIM.setPos(
-            self.simWindow.width() / 2, self.simWindow.height() / 2)
-        self.graphicsScene.addItem(self.CENTER_OF_SIM)
-
-    def create_food(self, food_amount):
-        """Draw the food items to the screen and create new food objects"""
-        for _ in range(food_amount):
-            food_x = randint(
-                self.FOOD_BUFFER, self.graphicsScene.width() - self.FOOD_BUFFER)
-            food_y = randint(
-                self.FOOD_BUFFER, self.graphicsScene.height() - self.FOOD_BUFFER)
-            new_food = Food()
-            self.simulation.add_food(new_food)
-            self.graphicsScene.addItem(new_food)
-            new_food.setPos(food_x, food_y)
-
-    def random_perimeter_position(self):
-        """Retrun an (x,y) position along the perimeter of the scene.
-           Helpful when drawing creatures"""
-        direction = randint(1, 4)
-        if direction == 1:  # North
-            return (randint(self.BUFFER, self.graphicsScene.width() - self.BUFFER) - self.BUFFER,
-                    self.graphicsScene.height() - self.BUFFER)
-        if direction == 2:  # East
-            return (self.graphicsScene.width() - self.BUFFER,
-                    randint(self.BUFFER, self.graphicsScene.height() - self.BUFFER) - self.BUFFER)
-        if direction == 3:  # South
-            return randint(self.BUFFER, self.graphicsScene.width() - self.BUFFER) - self.BUFFER, 0
-        else:  # West
-            return 0, randint(self.BUFFER, self.graphicsScene.height() - self.BUFFER) - self.BUFFER
-
-    def draw_creature(self, creature):
-        """Draw an instance of a creature to the screen"""
-        new_pos = self.random_perimeter_position()
-        self.simulation.add_creature(creature)
-        self.graphicsScene.addItem(creature)
-        creature.setPos(new_pos[0], new_pos[1])
-
-    def create_creatures(self, creature_amount=10):
-        """Draw the creature items to the screen and create new creature objects"""
-        for _ in range(creature_amount):
-            new_creature = Creature()
-            self.draw_creature(new_creature)
+        self.creatureSprites = {}
+        self.foodSprites = {}
+        self.creatureSpritePool = []
+        self.foodSpritePool = []
+
+    def visible_bounds(self):
+        """Returns the (left, top, right, bottom) of the part of the world in view"""
+        visible = self.simWindow.mapToScene(
+            self.simWindow.viewport().rect()).boundingRect()
+        return (visible.left() - self.CULL_MARGIN, visible.top() - self.CULL_MARGIN,
+                visible.right() + self.CULL_MARGIN, visible.bottom() + self.CULL_MARGIN)
+
+    def viewport_changed(self):
+        """Let the loop know which part of the world to draw"""
+        if self.simulationLoop and self.graphicsScene:
+            self.simulationLoop.set_viewport(self.visible_bounds())
+
+    def zoom(self, factor):
+        """Zoom in or out, no further out than fits the whole world in view"""
+        if not self.graphicsScene:
+            return
+        scene = self.graphicsScene.sceneRect()
+        viewport = self.simWindow.viewport()
+        fit = min(viewport.width() / scene.width(),
+                  viewport.height() / scene.height(), 1)
+        current = self.simWindow.transform().m11()
+        factor = min(max(current * factor, fit), self.MAX_ZOOM) / current
+        self.simWindow.scale(factor, factor)
+        self.viewport_changed()
+
+    def creature_pixmap(self, creature_id):
+        return pixmap('Slime.png')
+
+    def food_pixmap(self, food_id):
+        return pixmap(Food.FOOD_IMAGES[food_id % len(Food.FOOD_IMAGES)])
+
+    def take_sprite(self, pool, image):
+        """Reuse a sprite from the pool if there is one, otherwise add a new one to the scene"""
+        if not pool:
+            sprite = QGraphicsPixmapItem(image)
+            self.graphicsScene.addItem(sprite)
+            return sprite
+
+        sprite = pool.pop()
+        if sprite.pixmap().cacheKey() != image.cacheKey():
+            sprite.setPixmap(image)
+        sprite.show()
+        return sprite
+
+    def sync_sprites(self, sprites, pool, entities, pixmap_for):
+        """Add, move and remove the sprites for one kind of entity so they match the snapshot.
+           Sprites which are no longer needed are hidden and returned to the pool"""
+        seen = set()
+        for entity_id, x, y in entities:
+            seen.add(entity_id)
+            sprite = sprites.get(entity_id)
+            if sprite is None:
+                sprite = self.take_sprite(pool, pixmap_for(entity_id))
+                sprites[entity_id] = sprite
+            sprite.setPos(x, y)
+
+        for entity_id in [i for i in sprites if i not in seen]:
+            sprite = sprites.pop(entity_id)
+            if len(pool) >= self.SPRITE_POOL_LIMIT:
+                # after zooming back in far more sprites are spare than will be needed again soon
+                self.graphicsScene.removeItem(sprite)
+                continue
+            sprite.hide()
+            pool.append(sprite)
+
+    def render(self, snapshot):
+        """Bring the graphics scene in line with a snapshot of the engine"""
+        started = perf_counter()
+        self.sync_sprites(self.foodSprites, self.foodSpritePool,
+                          snapshot.food, self.food_pixmap)
+        self.sync_sprites(self.creatureSprites, self.creatureSpritePool,
+                          snapshot.creatures, self.creature_pixmap)
+        if self.profiler:
+            self.profiler.add(RENDER, perf_counter() - started)
+
+    def toggle_overlay(self, shown):
+        """Start or stop profiling the simulation and showing the results"""
+        if shown:
+            self.profiler = Profiler()
+            self.previousReport = self.profiler.report()
+            self.performanceOverlay.setText("Measuring...")
+            self.performanceOverlay.adjustSize()
+            self.performanceOverlay.show()
+            self.performanceOverlay.raise_()
+            self.overlayTimer.start()
+        else:
+            self.profiler = None
+            self.performanceOverlay.hide()
+            self.overlayTimer.stop()
+        if self.engine:
+            self.engine.profiler = self.profiler
+
+    def update_overlay(self):
+        """Show the time taken by each phase since the last update"""
+        report = self.profiler.report()
+        lines = format_report(difference(report, self.previousReport))
+        self.previousReport = report
+        lines.append("%d creatures, %d food drawn" %
+                     (len(self.creatureSprites), len(self.foodSprites)))
+        self.performanceOverlay.setText("\n".join(lines))
+        self.performanceOverlay.adjustSize()
 
     def simulate(self):
         """Call the correct function based on the simulation state"""
@@ -229,15 +424,135 @@ class SimulationView:
 
     def start(self):
         """Start the simulation"""
-        self.create_graphics_scene()
-        self.simulation = Simulation(self.mainWindow)
-        self.simulationLoop = SimulationLoop(self)
-        self.create_food(self.mainWindow.food_slider.sliderPosition())
-        self.create_creatures()
+        self.worldScale = world_scale(
+            self.mainWindow.world_size_comboBox.currentText())
+        width = int(self.simWindow.width() * sqrt(self.worldScale))
+        height = int(self.simWindow.height() * sqrt(self.worldScale))
+        self.create_graphics_scene(width, height)
+        config = self.mainWindow.simulation_config()
+        self.simulation = Simulation(config.replace(
+            width=width, height=height, food_amount=config.foodAmount * self.worldScale,
+            starting_population=config.startingPopulation * self.worldScale))
+        logging.info("Starting simulation with seed " +
+                     str(self.simulation.seed))
+        if self.profiler:
+            self.profiler.reset()
+            self.previousReport = self.profiler.report()
+        self.engine = Engine(self.simulation, width, height,
+                             events=EventLog([LoggingSink()]), profiler=self.profiler)
+        self.engine.populate()
+        self.run_engine()
+
+    def run_engine(self):
+        """Draw the engine and start running it on a SimulationLoop"""
+        viewport = self.visible_bounds()
+        self.simulationLoop = SimulationLoop(self, self.engine, steps_per_frame(
+            self.mainWindow.simulation_speed_comboBox.currentText()), viewport)
+        self.render(self.engine.snapshot(viewport))
         self.graphView.set_simulation(self.simulation)
         self.graphView.create_axis()
         self.simulationLoop.start()
 
+    def choose_checkpoint_destination(self):
+        """Ask the user where to save a checkpoint of the running simulation"""
+        if not isinstance(self.simulationLoop, SimulationLoop):
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self.mainWindow, "Save Checkpoint", "", "Checkpoints (*.npz)")
+        if path:
+            self.simulationLoop.save_checkpoint(path)
+
+    def choose_checkpoint(self):
+        """Ask the user for a checkpoint and carry on simulating from it"""
+        path, _ = QFileDialog.getOpenFileName(
+            self.mainWindow, "Resume Checkpoint", "", "Checkpoints (*.npz)")
+        if path:
+            self.resume_checkpoint(path)
+
+    def resume_checkpoint(self, path):
+        """Carry on a simulation saved with Save Checkpoint or the headless --checkpoint"""
+        try:
+            engine = restore(path, events=EventLog([LoggingSink()]), profiler=self.profiler)
+        except (OSError, ValueError) as error:
+            self.show_message("Cannot resume: " + str(error))
+            return
+        if self.simulationStarted:
+            self.cancel_simulation()
+        if self.profiler:
+            self.profiler.reset()
+            self.previousReport = self.profiler.report()
+        self.engine = engine
+        self.simulation = self.engine.simulation
+        # the food slider is per window sized area, so keep it in step with the saved world
+        self.worldScale = max(1, round(self.engine.width * self.engine.height /
+                                       (self.simWindow.width() * self.simWindow.height())))
+        logging.info("Resuming simulation with seed " + str(self.simulation.seed) +
+                     " at generation " + str(self.simulation.generation))
+        self.create_graphics_scene(self.engine.width, self.engine.height)
+        self.run_engine()
+        self.isSimulating = True
+        self.simulationStarted = True
+
+    def choose_recording(self):
+        """Ask the user for a recording directory and play it back"""
+        path = QFileDialog.getExistingDirectory(
+            self.mainWindow, "Open Recording")
+        if path:
+            self.play_recording(path)
+
+    def play_recording(self, path):
+        """Play back a recording made with a TrajectoryRecorder instead of simulating"""
+        try:
+            reader = TrajectoryReader(path)
+        except (OSError, ValueError, KeyError) as error:
+            self.show_message("Cannot play back %s: %s" % (path, error))
+            return
+        if len(reader) == 0:
+            self.show_message("The recording in %s has no time steps" % path)
+            return
+        if self.simulationStarted:
+            self.cancel_simulation()
+
+        self.create_graphics_scene(reader.width, reader.height)
+        self.simulation = None
+        self.engine = None
+        self.graphView.set_simulation(reader.config)
+        self.graphView.create_axis()
+        self.simulationLoop = PlaybackLoop(self, reader)
+
+        self.playbackSlider.blockSignals(True)
+        self.playbackSlider.setRange(0, len(reader) - 1)
+        self.playbackSlider.blockSignals(False)
+        self.playbackSlider.show()
+        self.playbackSlider.raise_()
+
+        self.simulationLoop.seek(0)
+        self.simulationLoop.start()
+        self.isSimulating = True
+        self.simulationStarted = True
+
+    def scrub_playback(self, frame):
+        """Jump to the time step the user picked with the playback slider"""
+        if isinstance(self.simulationLoop, PlaybackLoop):
+            self.simulationLoop.seek(frame)
+
+    def show_playback_position(self, frame):
+        """Move the playback slider without it seeking again"""
+        self.playbackSlider.blockSignals(True)
+        self.playbackSlider.setValue(frame)
+        self.playbackSlider.blockSignals(False)
+
+    def change_speed(self, speed_string):
+        """Change how many simulation steps are run for every frame drawn"""
+        if isinstance(self.simulationLoop, SimulationLoop):
+            self.simulationLoop.set_steps_per_frame(
+                steps_per_frame(speed_string))
+
+    def change_food_amount(self, food_amount):
+        """The new amount of food is spawned from the next generation on"""
+        if isinstance(self.simulationLoop, SimulationLoop):
+            self.simulationLoop.set_food_amount(food_amount * self.worldScale)
+
     def toggle_simulation(self):
         """Toggle whether or not we are currently simulating"""
         if not self.simulationStarted:
@@ -261,16 +576,15 @@ class SimulationView:
         issue with the C++ bindings not causing the de constructor to always
         run, so we need to delete the assets ourself
         """
-        if not self.simulation:
+        if self.simulation:
+            self.simulation.clear()
+        if not self.graphicsScene:
             return
 
-        food_list = list(self.simulation.food)
-        for food in food_list:
-            self.simulation.food.remove(food)
-
-        creature_list = list(self.simulation.creatures)
-        for creature in creature_list:
-            self.simulation.creatures.remove(creature)
+        self.creatureSprites = {}
+        self.foodSprites = {}
+        self.creatureSpritePool = []
+        self.foodSpritePool = []
 
         items_to_remove = list(self.graphicsScene.items())
         for item in items_to_remove:
@@ -279,64 +593,27 @@ class SimulationView:
     def cancel_simulation(self):
         """Clear the simulation scene and reset variables"""
         if self.simulationLoop:
-            self.simulationLoop.pause()
+            self.simulationLoop.cancel()
+            self.simulationLoop = None
         if self.graphView:
             self.graphView.reset_graph()
 
         self.delete_assets()
+        self.playbackSlider.hide()
         self.isSimulating = False
         self.simulationStarted = False
 
-    def cleanup_food(self):
-        """Delete all food from the scene"""
-        for food in list(self.simulation.food):
-            self.simulation.food.remove(food)
-            self.graphicsScene.removeItem(food)
-
-    def reset_creatures(self):
-        """Reset creature state as well as deal 
-           with creature reproduction / survival"""
-
-        for creature in list(self.simulation.creatures):
-
-            if creature.eaten_food >= 1:  # creature survived to next generation
-                new_pos = self.random_perimeter_position()
-                creature.setPos(new_pos[0], new_pos[1])
-                if creature.is_full():  # create survived with enough food to reproduce
-                    offspring = Creature(creature, self.simulation)
-                    self.draw_creature(offspring)
-
-            else:  # creature did not find enough food
-                logging.info("Creature " + str(creature) + " has perished")
-                self.simulation.creatures.remove(creature)
-                self.graphicsScene.removeItem(creature)
-                continue
-
-            creature.reset_state()
-
-    def go_to_next_generation(self):
-        """Set the simulation back to a starting state
-           and deal with setting up next generation"""
-
-        if not self.simulation:
-            return
-
-        self.cleanup_food()
-
-        self.create_food(self.mainWindow.food_slider.sliderPosition())
-
-        self.reset_creatures()
-
-        self.simulation.generation += 1
-
-        # update the graph with the population attributes
-        self.graphView.update_graph()
-
-        if len(self.simulation.creatures) == 0:
-            self.cancel_simulation()
-            box = QMessageBox(self.mainWindow)
-            box.setText("No creatures left")
-            box.setWindowTitle("")
-            box.open()
+    def simulation_finished(self, extinct):
+        """Called once the worker has stopped by itself"""
+        self.cancel_simulation()
+        if extinct:
+            self.show_message("No creatures left")
         else:
-            self.simulationLoop.start()
+            self.show_message("The simulation stopped unexpectedly, see the log for details")
+
+    def show_message(self, text):
+        """Tell the user something without waiting for them to close the message"""
+        box = QMessageBox(self.mainWindow)
+        box.setText(text)
+        box.setWindowTitle("")
+        box.open()
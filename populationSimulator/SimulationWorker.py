@@ -0,0 +1,173 @@
+# File SimulationWorker.py
+# Runs an engine on a background thread and publishes snapshots of it
+
+from queue import SimpleQueue, Empty
+from threading import Thread, Lock
+from time import perf_counter, sleep
+import logging
+
+from populationSimulator.Checkpoint import CheckpointWriter
+
+# messages which can be sent to a worker
+PAUSE = 'pause'
+RESUME = 'resume'
+CANCEL = 'cancel'
+SPEED = 'speed'
+FOOD = 'food'
+VIEWPORT = 'viewport'
+CHECKPOINT = 'checkpoint'
+
+
+class SimulationWorker:
+    """
+    Owns an engine once started and steps it on its own thread, so an
+    expensive step or generation turnover never blocks the GUI. The
+    worker is controlled by sending it messages and publishes its
+    progress, which consumers pull whenever suits them:
+    the latest snapshot of the world, the attribute averages of every
+    finished generation and whether the population has died out.
+    Given a viewport, snapshots only hold what is inside it.
+    Checkpoints are taken between steps, so they are always consistent
+    """
+
+    # how often a fresh snapshot is published while running
+    PUBLISH_INTERVAL = 1 / 60
+
+    def __init__(self, engine, steps_per_second=None, viewport=None):
+        self.engine = engine
+        # None runs the engine as fast as possible
+        self.stepsPerSecond = steps_per_second
+        # (left, top, right, bottom) of the part of the world being looked at
+        self.viewport = viewport
+        self.messages = SimpleQueue()
+        self.generations = SimpleQueue()
+        self.lock = Lock()
+        self.snapshot = engine.snapshot(viewport)
+        self.snapshotVersion = 0
+        self.extinct = False
+        self.finished = False
+        # created on the first checkpoint, writes them without holding up the engine
+        self.checkpoints = None
+        self.thread = Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def send(self, message, value=None):
+        self.messages.put((message, value))
+
+    def pause(self):
+        self.send(PAUSE)
+
+    def resume(self):
+        self.send(RESUME)
+
+    def set_steps_per_second(self, steps_per_second):
+        self.send(SPEED, steps_per_second)
+
+    def set_food_amount(self, food_amount):
+        """Food amount used from the next generation on"""
+        self.send(FOOD, food_amount)
+
+    def set_viewport(self, viewport):
+        """Only publish what is inside the given bounds from now on, None publishing everything"""
+        self.send(VIEWPORT, viewport)
+
+    def save_checkpoint(self, path):
+        """Save the whole simulation to a file as soon as the current step is done"""
+        self.send(CHECKPOINT, path)
+
+    def cancel(self):
+        """Stop the worker and wait for its thread to finish"""
+        self.send(CANCEL)
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def latest(self):
+        """Returns the newest snapshot along with a version number which changes whenever it does"""
+        with self.lock:
+            return self.snapshot, self.snapshotVersion
+
+    def finished_generations(self):
+        """Returns the attribute averages of every generation finished since the last call"""
+        finished = []
+        while True:
+            try:
+                finished.append(self.generations.get_nowait())
+            except Empty:
+                return finished
+
+    def publish(self):
+        snapshot = self.engine.snapshot(self.viewport)
+        with self.lock:
+            self.snapshot = snapshot
+            self.snapshotVersion += 1
+
+    def handle(self, message, value):
+        """Act on a message, returns False if the worker should stop"""
+        if message == CANCEL:
+            return False
+        if message == SPEED:
+            self.stepsPerSecond = value
+        elif message == FOOD:
+            self.engine.simulation.foodAmount = value
+        elif message == VIEWPORT:
+            # publish straight away so a paused simulation can still be looked around
+            self.viewport = value
+            self.publish()
+        elif message == CHECKPOINT:
+            if not self.checkpoints:
+                self.checkpoints = CheckpointWriter()
+            self.checkpoints.save(self.engine, value)
+        elif message == PAUSE:
+            # block until told to carry on, acting on anything else sent meanwhile
+            while True:
+                message, value = self.messages.get()
+                if message == RESUME:
+                    break
+                if not self.handle(message, value):
+                    return False
+        return True
+
+    def handle_messages(self):
+        while True:
+            try:
+                message, value = self.messages.get_nowait()
+            except Empty:
+                return True
+            if not self.handle(message, value):
+                return False
+
+    def run(self):
+        """Step the engine until cancelled or every creature has died"""
+        try:
+            self.step_until_done()
+        except Exception:
+            logging.exception("The simulation worker stopped unexpectedly")
+        finally:
+            if self.checkpoints:
+                self.checkpoints.close()
+            self.finished = True
+
+    def step_until_done(self):
+        engine = self.engine
+        next_step = perf_counter()
+        next_publish = perf_counter()
+        while self.handle_messages():
+            if not engine.step():
+                engine.next_generation()
+                self.generations.put(engine.simulation.creatures.attribute_means())
+                self.publish()
+                if engine.is_extinct():
+                    self.extinct = True
+                    return
+
+            now = perf_counter()
+            if now >= next_publish:
+                self.publish()
+                next_publish = now + self.PUBLISH_INTERVAL
+
+            if self.stepsPerSecond:
+                next_step = max(next_step + 1 / self.stepsPerSecond, now)
+                if next_step > now:
+                    sleep(next_step - now)
@@ -0,0 +1,103 @@
+# File SpatialGrid.py
+# A uniform grid used to quickly find the entities near a point
+
+from math import floor
+import numpy as np
+
+
+class SpatialGrid:
+    """
+    Buckets entity ids into square cells so that everything near a point
+    can be found by only looking at the cells around it. The grid is kept
+    up to date as entities are added, moved and removed rather than being
+    rebuilt every time step
+    """
+
+    CELL_SIZE = 100
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cellSize = cell_size
+        self.cells = {}  # (column, row) -> set of entity ids
+        self.cellOf = {}  # entity id -> (column, row)
+
+    def __len__(self):
+        return len(self.cellOf)
+
+    def cell(self, x, y):
+        """Returns the (column, row) of the cell containing a position"""
+        return floor(x / self.cellSize), floor(y / self.cellSize)
+
+    def insert(self, entity_id, x, y):
+        cell = self.cell(x, y)
+        self.cellOf[entity_id] = cell
+        self.cells.setdefault(cell, set()).add(entity_id)
+
+    def insert_many(self, entity_ids, xs, ys):
+        """Insert many entities at once, working out all of their cells together"""
+        columns = np.floor(np.asarray(xs, dtype=np.float64) / self.cellSize).astype(np.int64).tolist()
+        rows = np.floor(np.asarray(ys, dtype=np.float64) / self.cellSize).astype(np.int64).tolist()
+        entity_cells = list(zip(columns, rows))
+        self.cellOf.update(zip(entity_ids, entity_cells))
+        cells = self.cells
+        for entity_id, cell in zip(entity_ids, entity_cells):
+            members = cells.get(cell)
+            if members is None:
+                cells[cell] = {entity_id}
+            else:
+                members.add(entity_id)
+
+    def remove(self, entity_id):
+        cell = self.cellOf.pop(entity_id)
+        members = self.cells[cell]
+        members.discard(entity_id)
+        if not members:
+            del self.cells[cell]
+
+    def move(self, entity_id, x, y):
+        """Record the new position of an entity, only touching the cells if it changed cell"""
+        cell = self.cell(x, y)
+        if self.cellOf[entity_id] == cell:
+            return
+        self.remove(entity_id)
+        self.cellOf[entity_id] = cell
+        self.cells.setdefault(cell, set()).add(entity_id)
+
+    def clear(self):
+        self.cells = {}
+        self.cellOf = {}
+
+    def query(self, x, y, radius):
+        """
+        Returns the ids of every entity in a cell overlapping the square
+        around (x, y) with half width radius, in no particular order.
+        This is a superset of the entities within radius, callers still
+        need to check the distance
+        """
+        min_column, min_row = self.cell(x - radius, y - radius)
+        max_column, max_row = self.cell(x + radius, y + radius)
+        found = []
+        for column in range(min_column, max_column + 1):
+            for row in range(min_row, max_row + 1):
+                members = self.cells.get((column, row))
+                if members:
+                    found.extend(members)
+        return found
+
+    def query_rect(self, left, top, right, bottom):
+        """Returns the ids of every entity in a cell overlapping the given
+           rectangle, in no particular order"""
+        min_column, min_row = self.cell(left, top)
+        max_column, max_row = self.cell(right, bottom)
+        found = []
+        if (max_column - min_column + 1) * (max_row - min_row + 1) > len(self.cells):
+            # the rectangle is mostly empty cells, go through the occupied ones instead
+            for (column, row), members in self.cells.items():
+                if min_column <= column <= max_column and min_row <= row <= max_row:
+                    found.extend(members)
+            return found
+        for column in range(min_column, max_column + 1):
+            for row in range(min_row, max_row + 1):
+                members = self.cells.get((column, row))
+                if members:
+                    found.extend(members)
+        return found
@@ -0,0 +1,140 @@
+# File Statistics.py
+# Streams a summary of every generation of a simulation to disk
+
+import csv
+import json
+import os
+import numpy as np
+
+ATTRIBUTES = ('size', 'sight', 'speed')
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+# edges of the histogram bins, the last bin also counts everything above it
+HISTOGRAM_EDGES = np.linspace(0, 10, 21)
+
+COUNT_COLUMNS = ('generation', 'population', 'survived', 'born', 'starved', 'eaten',
+                 'food_spawned', 'food_eaten')
+
+
+def attribute_columns(name):
+    columns = [name + '_mean', name + '_variance', name + '_min']
+    columns += ['%s_q%d' % (name, round(quantile * 100)) for quantile in QUANTILES]
+    columns.append(name + '_max')
+    columns += ['%s_hist_%d' % (name, i) for i in range(len(HISTOGRAM_EDGES) - 1)]
+    return columns
+
+
+COLUMNS = COUNT_COLUMNS + tuple(column for name in ATTRIBUTES for column in attribute_columns(name))
+
+
+class RunningMoments:
+    """
+    The count, mean and variance of a stream of values, updated a batch at
+    a time without keeping the values (Chan et al.'s pairwise update)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.squaredDeviations = 0.0
+
+    def add(self, values):
+        count = len(values)
+        if count == 0:
+            return
+        mean = float(values.mean())
+        squared_deviations = float(((values - mean) ** 2).sum())
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.squaredDeviations += squared_deviations + delta * delta * self.count * count / total
+        self.count = total
+
+    def state(self):
+        return [self.count, self.mean, self.squaredDeviations]
+
+    def restore(self, state):
+        self.count, self.mean, self.squaredDeviations = state
+
+    def variance(self):
+        return self.squaredDeviations / self.count if self.count else None
+
+    def summary(self):
+        return {'count': self.count, 'mean': self.mean if self.count else None,
+                'variance': self.variance()}
+
+
+class StatisticsWriter:
+    """
+    Appends one row of csv per generation to a file: how many creatures
+    were born, starved and were eaten, how much food was eaten, and the
+    distribution of each attribute. Rows are summarised from the world as
+    it stands at the end of a generation and written straight away, so
+    nothing is kept from one generation to the next apart from the
+    running moments of each attribute over the whole run.
+    When resuming a run, rows from the given generation on are dropped
+    from an existing file since they will be written again
+    """
+
+    def __init__(self, path, resume_generation=None):
+        self.path = path
+        kept = []
+        if resume_generation is not None and os.path.exists(path):
+            with open(path, newline='', encoding='utf-8') as existing:
+                kept = [row for row in csv.DictReader(existing)
+                        if int(row['generation']) < resume_generation]
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, COLUMNS)
+        self.writer.writeheader()
+        self.writer.writerows(kept)
+        self.moments = {name: RunningMoments() for name in ATTRIBUTES}
+
+    def summarize(self, engine):
+        """Summarise the generation which is about to end, before its turnover"""
+        simulation = engine.simulation
+        population = simulation.creatures
+        n = population.count
+        alive = population.alive[:n]
+        eaten = population.eaten[:n]
+        survived = alive & (eaten >= 1)
+
+        # nobody is added during a generation, so every slot took part in it
+        row = {
+            'generation': simulation.generation,
+            'population': n,
+            'survived': int(np.count_nonzero(survived)),
+            'born': int(np.count_nonzero(survived & (eaten >= population.config.foodToReproduce))),
+            'starved': int(np.count_nonzero(alive & (eaten < 1))),
+            'eaten': n - population.living,
+            'food_spawned': engine.foodSpawned,
+            'food_eaten': engine.foodSpawned - len(simulation.food),
+        }
+        for name in ATTRIBUTES:
+            values = getattr(population, name)[:n]
+            self.moments[name].add(values)
+            row.update(self.describe(name, values))
+        return row
+
+    def describe(self, name, values):
+        if len(values) == 0:
+            return {}
+        description = {name + '_mean': float(values.mean()),
+                       name + '_variance': float(values.var()),
+                       name + '_min': float(values.min()),
+                       name + '_max': float(values.max())}
+        for quantile, value in zip(QUANTILES, np.quantile(values, QUANTILES)):
+            description['%s_q%d' % (name, round(quantile * 100))] = float(value)
+        counts, _ = np.histogram(np.minimum(values, HISTOGRAM_EDGES[-1]), HISTOGRAM_EDGES)
+        for i, count in enumerate(counts.tolist()):
+            description['%s_hist_%d' % (name, i)] = count
+        return description
+
+    def record_generation(self, engine):
+        self.writer.writerow(self.summarize(engine))
+        self.file.flush()
+
+    def close(self):
+        """Close the file and write the moments of each attribute over the whole run beside it"""
+        self.file.close()
+        with open(self.path + '.summary.json', 'w') as summary_file:
+            json.dump({name: moments.summary() for name, moments in self.moments.items()},
+                      summary_file, indent=1)
@@ -1,45 +1,52 @@
 # File Util.py
 # Contains some helpful functions which don't inherently belong to any class
 
-from math import sqrt, pow
+import numpy as np
 
 FUNCTION_STRINGS = ['1', 'n', 'n\u00B2', 'n\u00B3']
 
+# simulation steps run per rendered frame, Max runs as many as fit in a frame
+SPEED_STRINGS = ['1x', '2x', '5x', '10x', '50x', 'Max']
 
-def object_distance(object1, object2):
-    """Returns the absolute Euclidean distance between two QObjects object1 and object2"""
-    if not object1 or not object2:
+
+def steps_per_frame(speed_string):
+    """Returns the number of steps per frame of an entry of SPEED_STRINGS, None meaning unbounded"""
+    if speed_string == 'Max':
         return None
+    return int(speed_string[:-1])
+
+
+# area of the world as a multiple of the area of the window
+WORLD_SIZE_STRINGS = ['1x', '4x', '16x', '64x', '256x']
 
-    x_distance = object1.x() - object2.x()
-    y_distance = object1.y() - object2.y()
-    return sqrt(pow(x_distance, 2) + pow(y_distance, 2))
 
+def world_scale(world_size_string):
+    """Returns the area multiple of an entry of WORLD_SIZE_STRINGS"""
+    return int(world_size_string[:-1])
 
-def movement_delta(source, destination, distance):
-    """Returns the vector along which the source would need to move along in order to reach it's destination
-       with the additional restriction of only moving distance """
-    if not source or not destination:
-        return 0, 0
 
-    total_distance = object_distance(source, destination)
+class Point:
+    """A bare (x, y) location, useful as a target which is not an entity"""
 
-    # you are on the object, no movement required
-    if total_distance == 0:
-        return 0, 0
-    fraction_of_total_distance = distance / total_distance
-    delta_x = (destination.x() - source.x()) * fraction_of_total_distance
-    delta_y = (destination.y() - source.y()) * fraction_of_total_distance
-    return delta_x, delta_y
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
 
 
-def close_enough(object1, object2, epsilon):
-    """Determines if two object are closer than epsilon distance apart"""
-    if object1 and object2:
-        return object_distance(object1, object2) <= epsilon
-    return False
+def distance_squared(x1, y1, x2, y2):
+    """Returns the squared distance between two points, compare it to a squared
+       threshold to avoid taking a square root"""
+    delta_x = x2 - x1
+    delta_y = y2 - y1
+    return delta_x * delta_x + delta_y * delta_y
 
 
-def reverse_vector_2d(vector):
-    """Takes in a 2-tuple and reverses the direction"""
-    return vector[0] * -1, vector[1] * -1
+def movement_deltas(xs, ys, target_xs, target_ys, distance):
+    """Returns the vectors along which each point moves distance towards its
+       target, computing each distance once. Points already on their target stay put"""
+    delta_x = target_xs - xs
+    delta_y = target_ys - ys
+    total_distance = np.hypot(delta_x, delta_y)
+    fraction = np.divide(distance, total_distance,
+                         out=np.zeros(len(total_distance)), where=total_distance != 0)
+    return delta_x * fraction, delta_y * fraction